@@ -6,41 +6,7 @@ import re
 import sys
 from typing import List, Tuple, Dict
 
-try:
-    import sqlparse
-except ImportError:
-    print("Error: sqlparse is not installed. Please install it using: pip install sqlparse")
-    sys.exit(1)
-
-
-def extract_table_name(sql: str, statement_type: str) -> str:
-    """Extract table name from DELETE or TRUNCATE statement"""
-    sql = sql.strip()
-    
-    if statement_type == "TRUNCATE":
-        # Pattern: TRUNCATE TABLE [schema.]table_name
-        match = re.search(r'TRUNCATE\s+TABLE\s+(?:(\w+)\.)?(\w+)', sql, re.IGNORECASE)
-        if match:
-            schema = match.group(1)
-            table = match.group(2)
-            return f"{schema}.{table}" if schema else table
-    
-    elif statement_type == "DELETE":
-        # Pattern 1: DELETE FROM table_name
-        match = re.search(r'DELETE\s+FROM\s+(?:(\w+)\.)?(\w+)', sql, re.IGNORECASE)
-        if match:
-            schema = match.group(1)
-            table = match.group(2)
-            return f"{schema}.{table}" if schema else table
-        
-        # Pattern 2: DELETE alias FROM table_name alias (SQL Server style)
-        match = re.search(r'DELETE\s+\w+\s+FROM\s+(?:(\w+)\.)?(\w+)\s+\w+', sql, re.IGNORECASE)
-        if match:
-            schema = match.group(1)
-            table = match.group(2)
-            return f"{schema}.{table}" if schema else table
-    
-    return "UNKNOWN"
+import sql_index
 
 
 def extract_where_clause(sql: str) -> str:
@@ -59,26 +25,14 @@ def analyze_sql_file(file_path: str) -> List[Dict[str, str]]:
     """Analyze SQL file and extract DELETE/TRUNCATE statements"""
     results = []
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Parse SQL statements
-    statements = sqlparse.split(content)
+    # Statements are classified once by the shared index; only DELETE bodies are decoded
+    index = sql_index.load_index(file_path)
     
-    for statement in statements:
-        if not statement.strip():
-            continue
-        
-        # Format statement
-        formatted = sqlparse.format(statement, strip_comments=True).strip()
-        if not formatted:
-            continue
-        
-        # Check if it's DELETE or TRUNCATE
-        upper_sql = formatted.upper()
+    for entry, statement in sql_index.read_statements(file_path, index, types=['delete', 'truncate']):
+        table_name = entry['tables'][0] if entry['tables'] else "UNKNOWN"
         
-        if upper_sql.startswith('DELETE'):
-            table_name = extract_table_name(formatted, 'DELETE')
+        if entry['type'] == 'delete':
+            formatted = sql_index.strip_comments(statement).strip()
             where_clause = extract_where_clause(formatted)
             results.append({
                 'file': os.path.basename(file_path),
@@ -87,8 +41,7 @@ def analyze_sql_file(file_path: str) -> List[Dict[str, str]]:
                 'condition': where_clause
             })
         
-        elif upper_sql.startswith('TRUNCATE'):
-            table_name = extract_table_name(formatted, 'TRUNCATE')
+        else:
             results.append({
                 'file': os.path.basename(file_path),
                 'operation': 'truncate',
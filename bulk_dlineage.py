@@ -1,10 +1,217 @@
 #!/usr/bin/env python3
 import sys
+import os
+import json
+import time
+import threading
+import hashlib
+import select
+import signal
 import subprocess
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
 
-def run_dlineage_for_directory(dir_path, dlineage_args, verbose=False):
+import dir_config
+import lineage_io
+
+# 実行履歴などの状態ファイルの保存先
+DEFAULT_STATE_DIR = "data/output/bulk_dlineage"
+SQL_SUFFIXES = (".sql",)
+# dlineage.pyの出力先（dlineage.pyと同じ環境変数で変更できる）
+DLINEAGE_OUTPUT_DIR = os.environ.get("DLINEAGE_OUTPUT_DIR", "data/output/dlineage")
+# dlineage.pyがヒープの拡大・分割でもメモリ不足から回復できなかった場合の終了コード（dlineage.OOM_EXIT_CODE）
+DLINEAGE_OOM_EXIT_CODE = 3
+
+def discover_jobs(target_path, max_depth=1, ignore=(), stop_at_sql=False, skipped=None):
+    """
+    処理対象のディレクトリ（ジョブ）を再帰的に探索
+
+    Args:
+        target_path: 親ディレクトリ
+        max_depth: 探索する深さ（1で直下のみ、0で無制限）
+        ignore: 無視するディレクトリ名
+        stop_at_sql: SQLファイルを直接含むディレクトリをジョブとし、それ以上潜らない
+        skipped: 指定した場合、ジョブにならず直下のSQLファイルが分析されないディレクトリを
+            (ディレクトリ, SQLファイル数) として追加するリスト
+
+    Returns:
+        ジョブとなるディレクトリのリスト。max_depthに達したディレクトリか、
+        配下にディレクトリを持たないディレクトリがジョブになる。
+    """
+    jobs = []
+
+    def walk(dir_path, depth):
+        subdirs = sorted(d for d in dir_path.iterdir()
+                         if d.is_dir() and d.name not in ignore)
+        sql_count = sum(1 for f in dir_path.iterdir() if f.is_file() and f.suffix.lower() in SQL_SUFFIXES)
+        if depth > 0 and (not subdirs or depth == max_depth or (stop_at_sql and sql_count)):
+            jobs.append(dir_path)
+            return
+        if sql_count and skipped is not None:
+            skipped.append((dir_path, sql_count))
+        for subdir in subdirs:
+            walk(subdir, depth + 1)
+
+    walk(target_path, 0)
+    return jobs
+
+def measure_sql_bytes(dir_path):
+    """ディレクトリ配下のSQLファイルの合計バイト数"""
+    total = 0
+    for root, _, files in os.walk(dir_path):
+        for name in files:
+            if name.lower().endswith(SQL_SUFFIXES):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def load_history(history_path):
+    """過去の実行時間の記録を読み込む"""
+    try:
+        with open(history_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_history(history_path, history):
+    """実行時間の記録を保存"""
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    tmp_path = f"{history_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, history_path)
+
+def estimate_costs(jobs, sql_bytes, history):
+    """
+    ジョブのコスト（推定秒数、履歴がなければバイト数）を見積もる
+
+    同じディレクトリの過去の実行時間があれば入力サイズの変化で補正して使い、
+    なければ履歴全体の処理速度（秒/バイト）から換算する。
+    """
+    known = [h for h in history.values() if h.get("bytes") and h.get("duration")]
+    rate = (sum(h["duration"] for h in known) / sum(h["bytes"] for h in known)) if known else None
+
+    costs = {}
+    for job in jobs:
+        size = sql_bytes[job]
+        past = history.get(str(job.resolve()))
+        if rate is None:
+            costs[job] = float(size)
+        elif past and past.get("duration") and past.get("bytes"):
+            costs[job] = past["duration"] * max(size, 1) / past["bytes"]
+        elif past and past.get("duration"):
+            costs[job] = past["duration"]
+        else:
+            costs[job] = size * rate
+    return costs
+
+def compute_input_hash(dir_path, dlineage_args):
+    """
+    ディレクトリ配下の全ファイルと/envのメタデータファイルの相対パス・サイズ・更新時刻、dlineage.pyの引数から入力ハッシュを計算
+    （ファイルの中身は読まないため、ジョブ開始前の待ち時間はファイル数にのみ比例）
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(dlineage_args or []).encode("utf-8"))
+    for root, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            stat = os.stat(file_path)
+            digest.update(os.path.relpath(file_path, dir_path).encode("utf-8"))
+            digest.update(f"\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("ascii"))
+    # ディレクトリの外にあることが多い/envのメタデータも入力に含める
+    dlineage_args = dlineage_args or []
+    if "/env" in dlineage_args and dlineage_args.index("/env") + 1 < len(dlineage_args):
+        metadata_path = dlineage_args[dlineage_args.index("/env") + 1]
+        if os.path.isfile(metadata_path):
+            stat = os.stat(metadata_path)
+            digest.update(f"/env\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("ascii"))
+    return digest.hexdigest()
+
+def output_name(name):
+    """ジョブ名（対象ディレクトリからの相対パス）から出力名（/graphName）を作る"""
+    return str(name).replace(os.sep, "__")
+
+def expected_output_path(dir_path, dlineage_args):
+    """dlineage.pyが書き出す出力ファイルのパス（ファイル出力しない場合はNone）"""
+    dlineage_args = dlineage_args or []
+    graph_name = None
+    if "/graphName" in dlineage_args and dlineage_args.index("/graphName") + 1 < len(dlineage_args):
+        graph_name = dlineage_args[dlineage_args.index("/graphName") + 1]
+    if "/er" in dlineage_args:
+        base_name = graph_name or dir_path.name.replace('.sql', '').replace('.', '_')
+        return os.path.join(DLINEAGE_OUTPUT_DIR, f"erGraph_{base_name}.json")
+    if "/graph" in dlineage_args:
+        return os.path.join(DLINEAGE_OUTPUT_DIR, f"lineageGraph_{graph_name or dir_path.name}.json")
+    return None
+
+def load_journal(journal_path):
+    """ジャーナルを読み込み、ディレクトリごとの最新の記録を返す"""
+    records = {}
+    try:
+        with open(journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 強制終了時に書きかけになった行は無視
+                    continue
+                records[record["dir"]] = record
+    except OSError:
+        pass
+    return records
+
+def append_jsonl(path, record):
+    """JSONLファイルに1件追記し、クラッシュしても失われないようにディスクへ書き出す"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def select_pending_jobs(jobs, journal, input_hashes, resume=False, retry_failed=False):
+    """
+    ジャーナルを参照して今回実行するジョブを選ぶ
+
+    --retry-failed: 前回失敗したディレクトリのみ
+    --resume: 入力が変わらず成功済み（出力も残っている）ディレクトリを除外
+    """
+    pending = []
+    for job in jobs:
+        record = journal.get(str(job.resolve()))
+        if retry_failed:
+            if record and record["status"] != "success":
+                pending.append(job)
+            continue
+        if resume and record and record["status"] == "success" \
+                and record.get("input_hash") == input_hashes[job] \
+                and (not record.get("output") or lineage_io.resolve_outputs(record["output"])):
+            continue
+        pending.append(job)
+    return pending
+
+def read_rss_bytes(pid):
+    """プロセスの常駐メモリ量（取得できない環境ではNone）"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def read_log_excerpt(log_path, max_chars=2000):
+    """ログ末尾の抜粋"""
+    try:
+        with open(log_path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - max_chars))
+            return f.read().decode("utf-8", "replace").strip()
+    except OSError:
+        return ""
+
+def run_dlineage_for_directory(dir_path, dlineage_args, verbose=False, log_path=None,
+                               timeout=None, max_memory_mb=None, max_heap=None, profile_dir=None, jobs=1,
+                               append_log=False):
     """
     指定ディレクトリに対してdlineage.pyを実行
     
@@ -12,6 +219,16 @@ def run_dlineage_for_directory(dir_path, dlineage_args, verbose=False):
         dir_path: 処理対象のディレクトリパス
         dlineage_args: dlineage.pyに渡す追加引数のリスト
         verbose: 詳細出力フラグ
+        log_path: 標準出力・標準エラーを書き出すログファイル（Noneの場合は破棄）
+        timeout: 実行時間の上限（秒）
+        max_memory_mb: 常駐メモリの上限（MB）。超えた場合は強制終了
+        max_heap: JVMの最大ヒープサイズ（例: 2g）
+        profile_dir: プロファイル（JFR、cProfile、サマリー）の出力先。/profileとして渡される
+        jobs: 並列実行数。/jobsとして渡され、ヒープの既定値がメモリの等分から決まる
+        append_log: ログファイルを上書きせず追記する（workerでの失敗の記録を残して再実行する場合）
+
+    Returns:
+        (status, error_msg)。statusは success / failed / timeout / memory_exceeded / oom
     """
     # 基本コマンド: python dlineage.py /d <directory_path>
     cmd = [sys.executable, "dlineage.py", "/d", str(dir_path)]
@@ -19,34 +236,208 @@ def run_dlineage_for_directory(dir_path, dlineage_args, verbose=False):
     # 追加の引数を追加
     if dlineage_args:
         cmd.extend(dlineage_args)
+    if max_heap and "/maxHeap" not in cmd:
+        cmd.extend(["/maxHeap", max_heap])
+    if jobs > 1 and "/jobs" not in cmd:
+        # 並列に動くdlineage.pyの間でメモリを分け合う
+        cmd.extend(["/jobs", str(jobs)])
+    if profile_dir and "/profile" not in cmd:
+        cmd.extend(["/profile", profile_dir])
     
     if verbose:
         print(f"Processing: {dir_path}")
         print(f"Command: {' '.join(cmd)}")
+        if log_path:
+            print(f"Log: {log_path}")
     
+    # 出力はメモリに溜めずログファイルへ直接書き出す
+    if log_path:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        log_file = open(log_path, "ab" if append_log else "wb")
+    else:
+        log_file = open(os.devnull, "wb")
+    
+    status = None
+    with log_file:
+        process = subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+        started = time.time()
+        while process.poll() is None:
+            if timeout and time.time() - started > timeout:
+                status = "timeout"
+            elif max_memory_mb:
+                rss = read_rss_bytes(process.pid)
+                if rss is not None and rss > max_memory_mb * 1024 * 1024:
+                    status = "memory_exceeded"
+            if status:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+                break
+            time.sleep(0.2)
+    
+    excerpt = read_log_excerpt(log_path) if log_path else ""
+    if status == "timeout":
+        return status, f"Killed after {timeout}s timeout: {dir_path}"
+    if status == "memory_exceeded":
+        return status, f"Killed after exceeding {max_memory_mb}MB of memory: {dir_path}"
+    if process.returncode != 0:
+        status = "oom" if process.returncode == DLINEAGE_OOM_EXIT_CODE or "OutOfMemoryError" in excerpt else "failed"
+        return status, f"Error processing {dir_path} (exit code {process.returncode}): {excerpt}"
+    
+    if verbose:
+        print(f"Success: {dir_path}")
+    
+    return "success", None
+
+class DlineageWorker:
+    """JVMを起動したままのdlineage.py /workerプロセス（同じvendor/envのジョブで使い回し、メタデータの読み込みを省く）"""
+
+    def __init__(self, key, jvm_args, log_path):
+        self.key = key
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        # ジョブの出力はジョブごとのログへ、それ以外（JVMの起動時の警告など）はworkerのログへ
+        with open(log_path, "ab") as log_file:
+            self.process = subprocess.Popen([sys.executable, "dlineage.py", "/worker"] + jvm_args,
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=log_file,
+                                            universal_newlines=True, bufsize=1, start_new_session=True)
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def analyze(self, args, log_path, timeout=None, max_memory_mb=None):
+        """
+        1件分析する
+
+        Returns:
+            (status, error_msg)。statusは success / failed / timeout / memory_exceeded / oom
+        """
+        try:
+            self.process.stdin.write(json.dumps({"args": args, "log": log_path}) + "\n")
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            return "failed", "dlineage.py worker exited"
+        started = time.time()
+        while True:
+            readable, _, _ = select.select([self.process.stdout], [], [], 0.2)
+            if readable:
+                line = self.process.stdout.readline()
+                break
+            status = None
+            if timeout and time.time() - started > timeout:
+                status, error_msg = "timeout", f"Killed after {timeout}s timeout"
+            elif max_memory_mb:
+                rss = read_rss_bytes(self.process.pid)
+                if rss is not None and rss > max_memory_mb * 1024 * 1024:
+                    status, error_msg = "memory_exceeded", f"Killed after exceeding {max_memory_mb}MB of memory"
+            if status:
+                self.close(kill=True)
+                return status, error_msg
+        if not line:
+            return "failed", f"dlineage.py worker exited: {read_log_excerpt(log_path)}"
+        response = json.loads(line)
+        if response["status"] == "ok":
+            return "success", None
+        if response["status"] == "oom":
+            return "oom", response.get("error")
+        return "failed", f"{response.get('error')}: {read_log_excerpt(log_path)}"
+
+    def close(self, kill=False):
+        if not self.alive():
+            return
+        if kill:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        else:
+            self.process.stdin.close()
+        self.process.wait()
+
+class WorkerPool:
+    """vendor/envごとの常駐workerを最大size個まで保持する（足りない場合は別のvendor/envのアイドルworkerを止める）"""
+
+    def __init__(self, size, log_dir):
+        self.size = size
+        self.log_dir = log_dir
+        self.idle = []
+        self.count = 0
+        self.started = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, key, jvm_args):
+        with self.lock:
+            for worker in self.idle:
+                if worker.key == key:
+                    self.idle.remove(worker)
+                    return worker
+            if self.count >= self.size and self.idle:
+                self.idle.pop(0).close()
+                self.count -= 1
+            self.count += 1
+            self.started += 1
+            log_path = os.path.join(self.log_dir, f"worker_{self.started}.log")
+        return DlineageWorker(key, jvm_args, log_path)
+
+    def release(self, worker):
+        with self.lock:
+            if worker.alive():
+                self.idle.append(worker)
+            else:
+                self.count -= 1
+
+    def close(self):
+        with self.lock:
+            for worker in self.idle:
+                worker.close()
+            self.idle = []
+
+def worker_jvm_args(dlineage_args, max_heap=None, jobs=1):
+    """workerの起動時に渡す引数（vendor、メタデータ、JVMオプション）"""
+    jvm_args = []
+    for option in dir_config.WORKER_OPTIONS:
+        if option in dlineage_args and dlineage_args.index(option) + 1 < len(dlineage_args):
+            jvm_args += [option, dlineage_args[dlineage_args.index(option) + 1]]
+    if max_heap and "/maxHeap" not in jvm_args:
+        jvm_args += ["/maxHeap", max_heap]
+    if jobs > 1:
+        jvm_args += ["/jobs", str(jobs)]
+    return jvm_args
+
+def run_dlineage_on_worker(pool, dir_path, dlineage_args, log_path, timeout=None, max_memory_mb=None,
+                           max_heap=None, profile_dir=None, jobs=1):
+    """常駐workerでディレクトリを分析する（メモリ不足の場合はヒープの拡大・分割ができる単独プロセスで再実行）"""
+    args = ["/d", str(dir_path)] + list(dlineage_args)
+    if profile_dir and "/profile" not in args:
+        args += ["/profile", profile_dir]
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    worker = pool.acquire(dir_config.worker_key(dlineage_args), worker_jvm_args(dlineage_args, max_heap, jobs))
     try:
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            check=True
-        )
-        
-        if verbose:
-            print(f"Success: {dir_path}")
-            if result.stdout:
-                print(f"Output: {result.stdout}")
-        
-        return True, None
-        
-    except subprocess.CalledProcessError as e:
-        error_msg = f"Error processing {dir_path}: {e.stderr if e.stderr else str(e)}"
-        return False, error_msg
+        status, error_msg = worker.analyze(args, log_path, timeout, max_memory_mb)
+    finally:
+        pool.release(worker)
+    if status == "oom":
+        # workerのOutOfMemoryErrorの記録の後ろに再実行のログを続ける
+        return run_dlineage_for_directory(dir_path, dlineage_args, False, log_path, timeout, max_memory_mb,
+                                          max_heap, profile_dir, jobs, append_log=True)
+    if status in ("timeout", "memory_exceeded"):
+        error_msg = f"{error_msg}: {dir_path}"
+    elif error_msg:
+        error_msg = f"Error processing {dir_path}: {error_msg}"
+    return status, error_msg
+
+def output_sizes(paths):
+    """出力ファイルのサイズ"""
+    return {path: os.path.getsize(path) for path in paths if path and os.path.exists(path)}
+
+def log_name(name):
+    """ジョブ名からログファイル名を作る"""
+    return output_name(name) + ".log"
+
+def profile_dir_for(profile_root, run_id, name):
+    """ジョブごとのプロファイル出力先ディレクトリ"""
+    if not profile_root:
+        return None
+    return os.path.join(profile_root, run_id, str(name).replace(os.sep, "__"))
 
 def main():
     parser = argparse.ArgumentParser(
-        description="指定ディレクトリ直下のすべてのディレクトリに対してdlineage.pyを実行",
+        description="指定ディレクトリ配下のディレクトリに対してdlineage.pyを実行",
         epilog="""
 使用例:
   # Oracle SQLで処理
@@ -60,6 +451,17 @@ def main():
   
   # 複数のオプションを指定
   %(prog)s /path/to/parent/dir /t postgresql /json /s /i
+  
+  # 3階層下まで探索し、4並列で大きいディレクトリから処理
+  %(prog)s --max-depth 3 --stop-at-sql -j 4 /path/to/parent/dir /t oracle
+  
+  # 中断した実行を再開 / 失敗したディレクトリのみ再実行
+  %(prog)s --resume /path/to/parent/dir /t oracle /graph
+  %(prog)s --retry-failed /path/to/parent/dir /t oracle /graph
+  
+  # ディレクトリごとの.dlineage.json（vendor、env、defaultDatabase、defaultSchema、args）で方言を切り替え、
+  # 同じvendor/envのジョブを常駐workerで処理
+  %(prog)s --persistent-workers -j 4 /path/to/parent/dir /graph
 """,
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
@@ -78,6 +480,69 @@ def main():
         default=[],
         help="無視するディレクトリ名（例: --ignore .git __pycache__）"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="並列実行数（デフォルト: 1）"
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=1,
+        help="ジョブを探索する深さ（デフォルト: 1 = 直下のみ、0 = 無制限）"
+    )
+    parser.add_argument(
+        "--stop-at-sql",
+        action="store_true",
+        help="SQLファイルを直接含むディレクトリをジョブとし、その配下は探索しない"
+    )
+    parser.add_argument(
+        "--state-dir",
+        default=DEFAULT_STATE_DIR,
+        help=f"実行履歴の保存先（デフォルト: {DEFAULT_STATE_DIR}）"
+    )
+    parser.add_argument(
+        "--journal",
+        help="ジャーナルファイルのパス（デフォルト: {state-dir}/journal.jsonl）"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="入力が変わらず成功済みのディレクトリをスキップして再開"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="前回失敗したディレクトリのみ再実行"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="1ジョブあたりの実行時間の上限（秒）。超えたジョブは強制終了"
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        help="1ジョブあたりの常駐メモリの上限（MB）。超えたジョブは強制終了"
+    )
+    parser.add_argument(
+        "--max-heap",
+        help="dlineage.pyのJVM最大ヒープサイズ（例: 2g）。/maxHeapとして渡される"
+    )
+    parser.add_argument(
+        "--profile",
+        help="ジョブごとのプロファイル（JFR、cProfile、ホットメソッドのサマリー）を{PROFILE}/{実行ID}/{ジョブ名}/に出力"
+    )
+    parser.add_argument(
+        "--persistent-workers",
+        action="store_true",
+        help="vendor/envごとに常駐するdlineage.py /workerでジョブを処理し、JVMと読み込んだメタデータを再利用"
+    )
+    parser.add_argument(
+        "--results",
+        help="結果を追記するJSONLファイル（デフォルト: {state-dir}/results.jsonl）"
+    )
     parser.add_argument(
         "dlineage_args",
         nargs=argparse.REMAINDER,
@@ -96,44 +561,156 @@ def main():
         print(f"Error: '{target_path}' is not a directory")
         sys.exit(1)
     
-    # 直下のディレクトリを取得
-    subdirs = [d for d in target_path.iterdir() 
-               if d.is_dir() and d.name not in args.ignore]
+    # 処理対象のディレクトリを探索
+    skipped_sql = []
+    subdirs = discover_jobs(target_path, args.max_depth, args.ignore, args.stop_at_sql, skipped_sql)
+    for dir_path, sql_count in skipped_sql:
+        # サブディレクトリと並んで置かれたSQLファイルはどのジョブにも含まれない
+        hint = "; use --stop-at-sql to analyze it as one job" if dir_path != target_path else ""
+        print(f"Warning: {sql_count} SQL file(s) directly in '{dir_path}' are not analyzed (it has subdirectories{hint})")
     
     if not subdirs:
         print(f"No subdirectories found in '{target_path}'")
         sys.exit(0)
     
-    print(f"Found {len(subdirs)} directories to process")
+    # ディレクトリごとの設定（.dlineage.json、親ディレクトリから継承）をコマンドラインの引数に重ねる
+    try:
+        job_args = {d: dir_config.job_args(args.dlineage_args, dir_config.inherited_config(d, target_path))
+                    for d in subdirs}
+    except ValueError as e:
+        print(f"Error: invalid {dir_config.CONFIG_NAME}: {e}")
+        sys.exit(1)
+    has_dir_config = any(job_args[d] != (args.dlineage_args or []) for d in subdirs)
+    # 出力名は対象ディレクトリからの相対パスから決め、別の親の同名ディレクトリと衝突しないようにする
+    for d in subdirs:
+        if "/graphName" not in job_args[d]:
+            job_args[d] = job_args[d] + ["/graphName", output_name(d.relative_to(target_path))]
+    
+    # ジャーナルを参照し、完了済みのディレクトリをスキップ
+    journal_path = args.journal or os.path.join(args.state_dir, "journal.jsonl")
+    journal = load_journal(journal_path)
+    input_hashes = {d: compute_input_hash(d, job_args[d]) for d in subdirs}
+    total_count = len(subdirs)
+    subdirs = select_pending_jobs(subdirs, journal, input_hashes, args.resume, args.retry_failed)
+    skipped_count = total_count - len(subdirs)
+    if skipped_count:
+        print(f"Skipping {skipped_count} directories already completed (journal: {journal_path})")
+    
+    # 大きいジョブから順に投入し、並列実行時の待ち時間を減らす
+    history_path = os.path.join(args.state_dir, "history.json")
+    history = load_history(history_path)
+    sql_bytes = {d: measure_sql_bytes(d) for d in subdirs}
+    costs = estimate_costs(subdirs, sql_bytes, history)
+    subdirs.sort(key=lambda d: costs[d], reverse=True)
+    groups = {}
+    for d in subdirs:
+        groups.setdefault(dir_config.worker_key(job_args[d]), []).append(d)
+    if args.persistent_workers:
+        # 同じvendor/envのジョブを続けて投入し、workerを使い回す（グループ内、グループ間とも大きい順）
+        group_costs = {key: sum(costs[d] for d in group) for key, group in groups.items()}
+        subdirs.sort(key=lambda d: (-group_costs[dir_config.worker_key(job_args[d])],
+                                    dir_config.worker_key(job_args[d]), -costs[d]))
+    
+    print(f"Found {len(subdirs)} directories to process ({sum(sql_bytes.values())} bytes of SQL, {args.jobs} worker(s))")
     if args.dlineage_args:
         print(f"Additional dlineage.py arguments: {' '.join(args.dlineage_args)}")
+    if len(groups) > 1 or has_dir_config:
+        print(f"Per-directory settings ({dir_config.CONFIG_NAME}): {len(groups)} vendor/env group(s)")
+        for (vendor, env, _, _), group in sorted(groups.items(), key=lambda item: str(item[0])):
+            print(f"  vendor={vendor or 'oracle'} env={env or '-'}: {len(group)} directories")
     print("-" * 50)
     
     success_count = 0
     error_count = 0
     errors = []
+    history_lock = threading.Lock()
+    status_counts = {}
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    logs_dir = os.path.join(args.state_dir, "logs", run_id)
+    results_path = args.results or os.path.join(args.state_dir, "results.jsonl")
+    pool = WorkerPool(args.jobs, logs_dir) if args.persistent_workers else None
     
-    for i, subdir in enumerate(subdirs, 1):
-        print(f"[{i}/{len(subdirs)}] Processing: {subdir.name}")
-        
-        success, error_msg = run_dlineage_for_directory(subdir, args.dlineage_args, args.verbose)
-        
-        if success:
-            success_count += 1
-            print(f"  ✓ Success")
+    def run_job(subdir):
+        started = time.time()
+        log_path = os.path.join(logs_dir, log_name(subdir.relative_to(target_path)))
+        profile_dir = profile_dir_for(args.profile, run_id, subdir.relative_to(target_path))
+        if pool is not None:
+            status, error_msg = run_dlineage_on_worker(
+                pool, subdir, job_args[subdir], log_path,
+                args.timeout, args.max_memory, args.max_heap, profile_dir, args.jobs)
         else:
-            error_count += 1
-            errors.append((subdir.name, error_msg))
-            print(f"  ✗ Failed: {error_msg}")
-        
-        print()
+            status, error_msg = run_dlineage_for_directory(
+                subdir, job_args[subdir], args.verbose, log_path,
+                args.timeout, args.max_memory, args.max_heap, profile_dir, args.jobs)
+        duration = time.time() - started
+        if status == "success":
+            with history_lock:
+                history[str(subdir.resolve())] = {"bytes": sql_bytes[subdir], "duration": round(duration, 3)}
+                save_history(history_path, history)
+        return status, error_msg, duration, log_path, started
+    
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {executor.submit(run_job, subdir): subdir for subdir in subdirs}
+        for i, future in enumerate(as_completed(futures), 1):
+            subdir = futures[future]
+            name = subdir.relative_to(target_path)
+            status, error_msg, duration, log_path, started = future.result()
+            print(f"[{i}/{len(subdirs)}] {name} ({sql_bytes[subdir]} bytes, {duration:.1f}s)")
+            output_path = expected_output_path(subdir, job_args[subdir])
+            # メモリ不足で分割実行された場合は、分割ごとの出力（マニフェストに記載）
+            output_paths = lineage_io.resolve_outputs(output_path) if output_path else []
+            finished_at = datetime.now().isoformat(timespec="seconds")
+            append_jsonl(journal_path, {
+                "dir": str(subdir.resolve()),
+                "status": status,
+                "input_hash": input_hashes[subdir],
+                "output": output_path,
+                "outputs": output_paths,
+                "duration": round(duration, 3),
+                "finished_at": finished_at,
+            })
+            # ダッシュボード向けの機械可読な結果
+            append_jsonl(results_path, {
+                "run_id": run_id,
+                "dir": str(subdir.resolve()),
+                "name": str(name),
+                "status": status,
+                "duration": round(duration, 3),
+                "input_bytes": sql_bytes[subdir],
+                "dlineage_args": job_args[subdir],
+                "output_sizes": output_sizes(output_paths + [log_path]),
+                "log": log_path,
+                "profile": profile_dir_for(args.profile, run_id, name),
+                "error": error_msg[-1000:] if error_msg else None,
+                "started_at": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+                "finished_at": finished_at,
+            })
+            status_counts[status] = status_counts.get(status, 0) + 1
+            
+            if status == "success":
+                success_count += 1
+                print(f"  ✓ Success")
+            else:
+                error_count += 1
+                errors.append((name, error_msg))
+                print(f"  ✗ {status}: {error_msg}")
+            
+            print()
+    if pool is not None:
+        pool.close()
     
     # サマリー表示
     print("=" * 50)
     print("Summary:")
-    print(f"  Total: {len(subdirs)}")
+    print(f"  Total: {total_count}")
+    print(f"  Skipped: {skipped_count}")
     print(f"  Success: {success_count}")
     print(f"  Failed: {error_count}")
+    for status in ("failed", "timeout", "memory_exceeded", "oom"):
+        if status_counts.get(status):
+            print(f"    {status}: {status_counts[status]}")
+    print(f"  Results: {results_path}")
+    print(f"  Logs: {logs_dir}")
     
     if errors:
         print("\nFailed directories:")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Per-directory dlineage.py settings for bulk runs.
+
+A `.dlineage.json` file in a directory applies to that directory and everything below it:
+
+    {"vendor": "mssql", "env": "metadata.json", "defaultDatabase": "DWH", "defaultSchema": "dbo",
+     "args": ["/graph", "/s"]}
+
+Settings are inherited from the parent directories (up to the bulk target directory) and a nearer file
+overrides a farther one. They are merged into the command-line arguments, which act as the defaults.
+An option prefixed with "!" in 'args' removes an inherited or command-line option (with its value):
+
+    {"args": ["!/graph", "!/env"]}
+"""
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+CONFIG_NAME = '.dlineage.json'
+
+# Config keys that set a dlineage.py option with a value
+VALUE_KEYS = {
+    'vendor': '/t',
+    'env': '/env',
+    'defaultDatabase': '/defaultDatabase',
+    'defaultSchema': '/defaultSchema',
+}
+
+# dlineage.py options that take a value, so a config can replace the value instead of adding the option again
+VALUE_OPTIONS = ('/f', '/d', '/t', '/o', '/env', '/delimiter', '/showResultSetTypes', '/filterRelationTypes',
+                 '/defaultDatabase', '/defaultSchema', '/maxHeap', '/jobs', '/gcLog', '/edges', '/profile',
+                 '/graphName')
+
+# Options that are fixed when a JVM starts or that select the metadata it keeps loaded
+WORKER_OPTIONS = ('/t', '/env', '/maxHeap', '/gcLog')
+
+
+def is_config_file(path: str) -> bool:
+    return os.path.basename(path) == CONFIG_NAME
+
+
+def load_config(dir_path: str) -> Dict:
+    """The settings of one directory ({} without a config file); /env paths are relative to the file"""
+    path = os.path.join(dir_path, CONFIG_NAME)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}")
+    if not isinstance(config, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+    unknown = set(config) - set(VALUE_KEYS) - {'args'}
+    if unknown:
+        raise ValueError(f"{path}: unknown keys {', '.join(sorted(unknown))}")
+    if not isinstance(config.get('args', []), list):
+        raise ValueError(f"{path}: 'args' must be a list")
+    if config.get('env'):
+        config['env'] = os.path.normpath(os.path.join(dir_path, config['env']))
+    return config
+
+
+def inherited_config(dir_path: str, root: str) -> Dict:
+    """Settings of dir_path merged from root down to it; 'args' accumulate, other keys are overridden"""
+    dir_path = os.path.abspath(dir_path)
+    root = os.path.abspath(root)
+    chain = [dir_path]
+    while chain[-1] != root and os.path.dirname(chain[-1]) != chain[-1]:
+        chain.append(os.path.dirname(chain[-1]))
+    merged = {}
+    for path in reversed(chain):
+        config = load_config(path)
+        args = merged.get('args', []) + config.get('args', [])
+        for key, option in VALUE_KEYS.items():
+            # "!/env" in a nearer file also drops an inherited "env" key
+            if '!' + option in config.get('args', []) and key not in config:
+                merged.pop(key, None)
+        merged.update(config)
+        if args:
+            merged['args'] = args
+    return merged
+
+
+def remove_option(args: List[str], option: str) -> List[str]:
+    """args without option (and its value for options that take one)"""
+    args = list(args)
+    while option in args:
+        position = args.index(option)
+        del args[position:position + (2 if option in VALUE_OPTIONS else 1)]
+    return args
+
+
+def apply_args(args: List[str], extra: List[str]) -> List[str]:
+    """
+    args with extra applied: options with a value replace the existing value, flags are added once
+    and "!<option>" removes the option
+    """
+    args = list(args)
+    position = 0
+    while position < len(extra):
+        option = extra[position]
+        if option.startswith('!'):
+            args = remove_option(args, option[1:])
+            position += 1
+            continue
+        if option in VALUE_OPTIONS and position + 1 < len(extra):
+            value = extra[position + 1]
+            if option in args and args.index(option) + 1 < len(args):
+                args[args.index(option) + 1] = value
+            else:
+                args += [option, value]
+            position += 2
+            continue
+        if option not in args:
+            args.append(option)
+        position += 1
+    return args
+
+
+def job_args(default_args: List[str], config: Dict) -> List[str]:
+    """Command-line arguments with a directory's settings applied"""
+    extra = list(config.get('args', []))
+    for key, option in VALUE_KEYS.items():
+        if config.get(key):
+            extra += [option, str(config[key])]
+    return apply_args(default_args or [], extra)
+
+
+def worker_key(args: List[str]) -> Tuple[Optional[str], ...]:
+    """Jobs with the same key can share one dlineage.py /worker (same vendor, metadata and JVM options)"""
+    return tuple(args[args.index(option) + 1] if option in args and args.index(option) + 1 < len(args) else None
+                 for option in WORKER_OPTIONS)
@@ -1,27 +1,129 @@
 # python3
 import os
+import re
+import io
+import json
+import time
+import hashlib
+import collections
+import cProfile
+import pstats
+import shutil
+import tempfile
+import subprocess
 import webbrowser
 import jpype
 import sys
 from datetime import datetime
 
+import sql_index
+import lineage_io
+import lineage_export
+import graph_levels
+import search_index
+import sql_dedup
+import dir_config
+
+# Where graph outputs are written (the web server in watch mode points this at the directory it serves)
+OUTPUT_DIR = os.environ.get("DLINEAGE_OUTPUT_DIR", os.path.join("data", "output", "dlineage"))
+
+# /dedup reports (distinct statements and the locations of their copies)
+DEDUP_REPORT_DIR = os.path.join("data", "output", "dedup")
+
+# Node lists of the Java dataflow model read by /edges, with the type used when a node has none
+DATAFLOW_NODE_LISTS = [("getTables", "table"), ("getViews", "view"), ("getResultsets", "resultset"),
+                       ("getVariables", "variable")]
+
+# Pre-processed metadata snapshots for /env
+SQLENV_CACHE_DIR = os.path.join("data", "cache", "sqlenv")
+
+# ER graphs of DDL-only analyses (/er /ddlOnly), keyed by the DDL content and the options
+ER_CACHE_DIR = os.path.join("data", "cache", "er")
+
+# Options (with their values) that do not change the ER graph: the inputs, JVM settings and report locations
+ER_CACHE_IGNORED_OPTIONS = ("/f", "/d", "/o", "/maxHeap", "/jobs", "/gcLog", "/profile", "/edges", "/graphName")
+
+# At most this many snapshot files are kept in SQLENV_CACHE_DIR; the least recently used are removed first
+SQLENV_CACHE_MAX_FILES = 32
+
+# Parsed TSQLEnv objects kept in memory for the lifetime of the process (and JVM), most recently used last
+SQLENV_MEMORY_ENTRIES = 4
+_sql_env_cache = collections.OrderedDict()
+
+# Whether the "TSQLEnv is not Serializable" note was already printed
+_sql_env_serializable_noted = False
+
+# Files written by the current analysis, reported back to the caller in /worker mode
+_written_files = []
+
+# Temporary inputs of the current analysis (e.g. the /dedup statement file or an input mirror), removed when it finishes
+_temp_files = []
+
+# A /worker process serves many requests and must not open browser pages
+_open_browser = True
+
+# /profile: JFR execution samples are attributed to the first phase whose class prefix appears in the stack
+PROFILE_PHASES = [
+    ("parse", ("gudusoft.gsqlparser.TGSqlParser", "gudusoft.gsqlparser.TLexer", "gudusoft.gsqlparser.TParser")),
+    ("output", ("gudusoft.gsqlparser.dlineage.graph.", "gudusoft.gsqlparser.dlineage.util.XML2Model",
+                "gudusoft.gsqlparser.util.json.", "gudusoft.gsqlparser.dlineage.util.ProcessUtility")),
+    ("resolution", ("gudusoft.gsqlparser.dlineage.",)),
+]
+PROFILE_TOP = 20
+
+# Adaptive heap (without /maxHeap): a base for the parser itself plus a multiple of the SQL and metadata bytes,
+# capped at a share of the memory the container may use
+HEAP_MIN_MB = 256
+HEAP_PER_INPUT_BYTE = 64
+HEAP_MAX_MEMORY_RATIO = 0.75
+# A /worker does not know its inputs in advance and takes half of the memory
+HEAP_WORKER_MEMORY_RATIO = 0.5
+
+# Recovery from java.lang.OutOfMemoryError: retry with a doubled heap while memory allows, then split the input
+OOM_EXIT_CODE = 3
+OOM_MAX_RETRIES = 2
+OOM_BATCHES = 2
+# Retries already made by the processes before this one (set when re-executing after an OutOfMemoryError)
+OOM_ATTEMPT_ENV = "DLINEAGE_OOM_ATTEMPT"
+
 def get_file_character_count(file_path):
+    # Counted as read by Python (default encoding, universal newlines), which is what the limit is defined on
     character_count = 0
-    with open(file_path, "r") as file:
-        try:
-            content = file.read()
-            character_count = len(content)
-        except:
-            print(file_path + " is not a text file.")
+    try:
+        with open(file_path, "r") as file:
+            character_count = len(file.read())
+    except UnicodeDecodeError:
+        print(file_path + " is not a text file.")
+    except OSError as e:
+        print(f"{file_path} cannot be read: {e.strerror}")
     return character_count
 
 def get_all_files(folder_path):
     all_files = []
     for root, dirs, files in os.walk(folder_path):
         for file in files:
+            # Per-directory settings of bulk runs are not SQL
+            if file == dir_config.CONFIG_NAME:
+                continue
             file_path = os.path.join(root, file)
             all_files.append(file_path)
     return all_files
+
+def without_config_files(dir_path):
+    """
+    The directory itself, or when it holds .dlineage.json files, a temporary mirror with the same name
+    (symbolic links to the other files) so the analyzer does not read them as SQL
+    """
+    if not any(dir_config.CONFIG_NAME in files for root, dirs, files in os.walk(dir_path)):
+        return dir_path
+    tempRoot = tempfile.mkdtemp(prefix="dlineage_input_")
+    _temp_files.append(tempRoot)
+    mirror = os.path.join(tempRoot, os.path.basename(os.path.normpath(dir_path)))
+    for path in get_all_files(dir_path):
+        link = os.path.join(mirror, os.path.relpath(path, dir_path))
+        os.makedirs(os.path.dirname(link), exist_ok=True)
+        os.symlink(os.path.abspath(path), link)
+    return mirror
 def get_text_files_character_count(folder_path):
     text_files = get_all_files(folder_path)
     total_character_count = 0
@@ -40,6 +142,166 @@ def save_to_file(file_name, contents):
     fh = open(file_name, 'w')
     fh.write(contents)
     fh.close()
+    _written_files.append(file_name)
+
+def open_browser(url):
+    if _open_browser:
+        webbrowser.open_new(url)
+
+def collect_referenced_names(sql_path):
+    """Collect the lower-cased identifiers used in a SQL file or directory"""
+    names = set()
+    paths = get_all_files(sql_path) if os.path.isdir(sql_path) else [sql_path]
+    for path in paths:
+        with sql_index.MappedSQLFile(path) as sql_file:
+            for match in re.finditer(rb'[A-Za-z_][\w$#]*', sql_file.buffer):
+                names.add(match.group().lower().decode('ascii'))
+    return names
+
+def _is_referenced(name, referenced_names):
+    # Qualified names such as "schema.table" are matched on the object name
+    return str(name).split('.')[-1].strip('"`[]').lower() in referenced_names
+
+def prune_metadata(node, referenced_names):
+    """Drop tables, views and other column containers that the input never mentions"""
+    if isinstance(node, dict):
+        return {key: prune_metadata(value, referenced_names) for key, value in node.items()}
+    if isinstance(node, list):
+        return [prune_metadata(item, referenced_names) for item in node
+                if not (isinstance(item, dict) and 'columns' in item and 'name' in item
+                        and not _is_referenced(item['name'], referenced_names))]
+    return node
+
+def prepare_metadata_snapshot(metadata_path, snapshot_key, referenced_names):
+    """Write a copy of metadata.json without the tables the input never mentions (for /envPrune)"""
+    snapshot_path = os.path.join(SQLENV_CACHE_DIR, snapshot_key + ".json")
+    if os.path.exists(snapshot_path):
+        os.utime(snapshot_path)
+        return snapshot_path
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    metadata = prune_metadata(metadata, referenced_names)
+    os.makedirs(SQLENV_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, snapshot_path)
+    return snapshot_path
+
+def prune_sql_env_cache():
+    """Keep the SQLENV_CACHE_MAX_FILES most recently used snapshot files (used files are touched)"""
+    if not os.path.isdir(SQLENV_CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(SQLENV_CACHE_DIR):
+        if name.endswith((".json", ".ser", ".failed")):
+            path = os.path.join(SQLENV_CACHE_DIR, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+    entries.sort(reverse=True)
+    for _, path in entries[SQLENV_CACHE_MAX_FILES:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _read_serialized_env(path):
+    if not os.path.exists(path):
+        return None
+    os.utime(path)
+    ObjectInputStream = jpype.JClass("java.io.ObjectInputStream")
+    BufferedInputStream = jpype.JClass("java.io.BufferedInputStream")
+    FileInputStream = jpype.JClass("java.io.FileInputStream")
+    try:
+        stream = ObjectInputStream(BufferedInputStream(FileInputStream(path)))
+        try:
+            return stream.readObject()
+        finally:
+            stream.close()
+    except jpype.JException:
+        # Stale or incompatible snapshot: parse the metadata again
+        return None
+
+def _write_serialized_env(sqlenv, path):
+    """
+    Store a Java-serialized TSQLEnv; returns False when the class is not Serializable or writing fails.
+    A failure leaves a marker next to the snapshot, so the same metadata is not serialized again.
+    """
+    if not isinstance(sqlenv, jpype.JClass("java.io.Serializable")):
+        return False
+    failed_path = path + ".failed"
+    if os.path.exists(failed_path):
+        os.utime(failed_path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    ObjectOutputStream = jpype.JClass("java.io.ObjectOutputStream")
+    BufferedOutputStream = jpype.JClass("java.io.BufferedOutputStream")
+    FileOutputStream = jpype.JClass("java.io.FileOutputStream")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        stream = ObjectOutputStream(BufferedOutputStream(FileOutputStream(tmp_path)))
+        try:
+            stream.writeObject(sqlenv)
+        finally:
+            stream.close()
+        os.replace(tmp_path, path)
+    except jpype.JException as e:
+        # e.g. a non-serializable field deep in the catalog; the snapshot key changes with the metadata
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with open(failed_path, 'w', encoding='utf-8') as f:
+            f.write(str(e) + "\n")
+        return False
+    return True
+
+def load_sql_env(vendor, metadata_path, referenced_names=None):
+    """
+    Load the TSQLEnv for a metadata.json.
+    Parsed environments are memoized per process (the most recent SQLENV_MEMORY_ENTRIES by file, vendor and
+    /envPrune name set). On disk, a serialized TSQLEnv is reused when the class is Serializable; otherwise the
+    catalog is parsed again by every new process, and only a /worker keeps it loaded between analyses.
+    """
+    global _sql_env_serializable_noted
+    stat = os.stat(metadata_path)
+    names_key = None
+    if referenced_names is not None:
+        names_key = hashlib.sha1("\n".join(sorted(referenced_names)).encode('utf-8')).hexdigest()[:16]
+    memo_key = (os.path.abspath(metadata_path), stat.st_size, stat.st_mtime, str(vendor), names_key)
+    if memo_key in _sql_env_cache:
+        _sql_env_cache.move_to_end(memo_key)
+        return _sql_env_cache[memo_key]
+
+    DataFlowAnalyzer = jpype.JClass("gudusoft.gsqlparser.dlineage.DataFlowAnalyzer")
+    snapshot_key = sql_index.file_sha256(metadata_path)
+    if names_key:
+        snapshot_key += "_" + names_key
+    serialized_path = os.path.join(SQLENV_CACHE_DIR, f"{snapshot_key}_{vendor}_{DataFlowAnalyzer.getVersion()}.ser")
+
+    sqlenv = _read_serialized_env(serialized_path)
+    if sqlenv is None:
+        # The catalog is parsed in Python only to prune it; otherwise the Java parser reads the file directly
+        source_path = metadata_path
+        if referenced_names is not None:
+            source_path = prepare_metadata_snapshot(metadata_path, snapshot_key, referenced_names)
+        TJSONSQLEnvParser = jpype.JClass("gudusoft.gsqlparser.sqlenv.parser.TJSONSQLEnvParser")
+        SQLUtil = jpype.JClass("gudusoft.gsqlparser.util.SQLUtil")
+        File = jpype.JClass("java.io.File")
+        jsonSQLEnvParser = TJSONSQLEnvParser(None, None, None)
+        envs = jsonSQLEnvParser.parseSQLEnv(vendor, SQLUtil.getFileContent(File(source_path)))
+        if envs != None and envs.length > 0:
+            sqlenv = envs[0]
+            if not _write_serialized_env(sqlenv, serialized_path) and not _sql_env_serializable_noted:
+                _sql_env_serializable_noted = True
+                print("Note: TSQLEnv could not be serialized, so /env metadata is parsed again by every new process. "
+                      "Use a /worker (serve --watch, bulk_dlineage --persistent-workers) to keep it loaded.")
+        prune_sql_env_cache()
+
+    _sql_env_cache[memo_key] = sqlenv
+    while len(_sql_env_cache) > SQLENV_MEMORY_ENTRIES:
+        _sql_env_cache.popitem(last=False)
+    return sqlenv
 
 def generate_output_filename(input_path):
     """Generate output JSON filename based on input file/directory name"""
@@ -49,223 +311,769 @@ def generate_output_filename(input_path):
         base_name = os.path.splitext(base_name)[0]
     return f"lineageGraph_{base_name}.json"
 
-def call_dataFlowAnalyzer(args):
+def graph_output_path(args):
+    """Where /graph writes the graph: named by /graphName, else after the input file/directory"""
+    if get_option(args, "/graphName") is not None:
+        output_filename = f"lineageGraph_{get_option(args, '/graphName')}.json"
+    elif get_option(args, "/f") is not None:
+        output_filename = generate_output_filename(get_option(args, "/f"))
+    elif get_option(args, "/d") is not None:
+        output_filename = generate_output_filename(get_option(args, "/d"))
+    else:
+        output_filename = "lineageGraph_default.json"
+    return os.path.join(OUTPUT_DIR, output_filename)
+
+def get_option(args, name):
+    if indexOf(args, name) != -1 and len(args) > indexOf(args, name) + 1:
+        return args[indexOf(args, name) + 1]
+    return None
+
+def with_option(args, name, value):
+    """A copy of args with the value of a /option replaced (or the option appended)"""
+    args = list(args)
+    if get_option(args, name) is not None:
+        args[indexOf(args, name) + 1] = value
+    else:
+        args += [name, value]
+    return args
+
+def available_memory_mb():
+    """Memory this process may use: the cgroup (v2 or v1) limit of the container, at most the physical memory"""
+    limits = []
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            limits.append(int(value))
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    limits.append(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+    return min(limits) // (1024 * 1024) if limits else None
+
+def input_bytes(args):
+    """Size of the SQL input and the /env metadata, scanned before the JVM starts"""
+    paths = []
+    for name in ("/f", "/d"):
+        path = get_option(args, name)
+        if path is not None and os.path.exists(path):
+            paths += get_all_files(path) if os.path.isdir(path) else [path]
+    metadataPath = get_option(args, "/env")
+    if metadataPath is not None and os.path.isfile(metadataPath):
+        paths.append(metadataPath)
+    return sum(os.path.getsize(path) for path in paths)
+
+def parse_heap_mb(size):
+    """-Xmx style size (2g, 512m, 1048576k) in MB"""
+    size = size.strip().lower()
+    units = {"k": 1.0 / 1024, "m": 1, "g": 1024, "t": 1024 * 1024}
+    if size[-1:] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size) // (1024 * 1024)
+
+def memory_share_mb(args):
+    """Available memory divided among the /jobs dlineage processes that run side by side"""
+    memory_mb = available_memory_mb()
+    jobs = int(get_option(args, "/jobs") or 1)
+    return memory_mb // max(1, jobs) if memory_mb else None
+
+def max_heap_mb(memory_mb):
+    return int(memory_mb * HEAP_MAX_MEMORY_RATIO) if memory_mb else None
+
+def choose_heap_mb(args):
+    """/maxHeap when given, otherwise a heap sized from the input and the available memory"""
+    if get_option(args, "/maxHeap") is not None:
+        return parse_heap_mb(get_option(args, "/maxHeap"))
+    memory_mb = memory_share_mb(args)
+    if indexOf(args, "/worker") != -1:
+        if not memory_mb:
+            return None
+        return max(HEAP_MIN_MB, int(memory_mb * HEAP_WORKER_MEMORY_RATIO))
+    heap_mb = HEAP_MIN_MB + input_bytes(args) * HEAP_PER_INPUT_BYTE // (1024 * 1024)
+    if memory_mb:
+        heap_mb = min(heap_mb, max(HEAP_MIN_MB, max_heap_mb(memory_mb)))
+    return heap_mb
+
+def gc_log_options(gc_log_path):
+    # Java 8 flags; newer JVMs map -Xloggc to unified logging and skip the flags they no longer know
+    return ["-Xloggc:" + gc_log_path, "-XX:+PrintGCDetails", "-XX:+PrintGCDateStamps",
+            "-XX:+IgnoreUnrecognizedVMOptions"]
+
+def start_jvm(args):
     # Start the Java Virtual Machine (JVM)
-    widget_server_url = "http://localhost:8000"
     jvm = jpype.getDefaultJVMPath()
     jar = "-Djava.class.path=jar/gudusoft.gsqlparser-2.8.5.8.jar"
-    jpype.startJVM(jvm, "-ea", jar)
+    jvm_options = ["-ea", jar]
+    heap_mb = choose_heap_mb(args)
+    if heap_mb is not None:
+        jvm_options.append("-Xmx%dm" % heap_mb)
+    gcLogPath = get_option(args, "/gcLog")
+    if gcLogPath is not None:
+        if os.path.dirname(gcLogPath):
+            os.makedirs(os.path.dirname(gcLogPath), exist_ok=True)
+        jvm_options += gc_log_options(gcLogPath)
+    if get_profile_dir(args) is not None:
+        # The parser recurses deeply; the default JFR stack depth (64) would cut off the phase frames
+        jvm_options.append("-XX:FlightRecorderOptions=stackdepth=2048")
+    jpype.startJVM(jvm, *jvm_options)
+    return heap_mb
 
+def is_out_of_memory(error):
     try:
-        TGSqlParser = jpype.JClass("gudusoft.gsqlparser.TGSqlParser")
-        DataFlowAnalyzer = jpype.JClass("gudusoft.gsqlparser.dlineage.DataFlowAnalyzer")
-        ProcessUtility = jpype.JClass("gudusoft.gsqlparser.dlineage.util.ProcessUtility")
-        JSON = jpype.JClass("gudusoft.gsqlparser.util.json.JSON")
-        XML2Model = jpype.JClass("gudusoft.gsqlparser.dlineage.util.XML2Model")
-        RemoveDataflowFunction = jpype.JClass("gudusoft.gsqlparser.dlineage.util.RemoveDataflowFunction")
-        File = jpype.JClass("java.io.File")
-        EDbVendor = jpype.JClass("gudusoft.gsqlparser.EDbVendor")
-        vendor = EDbVendor.dbvoracle
-        index = indexOf(args, "/t")
-        if index != -1 and len(args) > index + 1:
-            vendor = TGSqlParser.getDBVendorByName(args[index + 1])
-        if indexOf(args, "/version") != -1:
-            print("Version: " + DataFlowAnalyzer.getVersion())
-            print("Release Date: " + DataFlowAnalyzer.getReleaseDate())
-            return
+        return isinstance(error, jpype.JClass("java.lang.OutOfMemoryError"))
+    except Exception:
+        return "OutOfMemoryError" in str(error)
 
-        if indexOf(args, "/f") != -1 and len(args) > indexOf(args, "/f") + 1:
-            sqlFiles = File(args[indexOf(args, "/f") + 1])
-            if not sqlFiles.exists() or not sqlFiles.isFile():
-                print(args[indexOf(args, "/f") + 1] + " is not a valid file.")
-                return
-
-            character_count = get_file_character_count(args[indexOf(args, "/f") + 1])
-            if character_count > 10000:
-                print("SQLFlow lite version only supports processing SQL statements with a maximum of 10,"
-                      "000 characters. If you need to process SQL statements without length restrictions, "
-                      "please contact support@gudusoft.com for more information.")
-                return
-
-        elif indexOf(args, "/d") != -1 and len(args) > indexOf(args, "/d") + 1:
-            sqlFiles = File(args[indexOf(args, "/d") + 1])
-            if not sqlFiles.exists() or not sqlFiles.isDirectory():
-                print(args[indexOf(args, "/d") + 1] + " is not a valid directory.")
-                return
-            character_count = get_text_files_character_count(args[indexOf(args, "/d") + 1])
-            if character_count > 10000:
-                print("SQLFlow lite version only supports processing SQL statements with a maximum of 10,"
-                      "000 characters. If you need to process SQL statements without length restrictions, "
-                      "please contact support@gudusoft.com for more information.")
-                return
+def split_into_batches(args, batches):
+    """
+    Split the /f or /d input into contiguous batches of about equal size, each in its own temporary directory
+    named <input>_part<n> (so the graph outputs are named after it). A single file is split between statements,
+    a directory between files. Returns (temporary root, batch directories), or None when it cannot be split.
+    """
+    if get_option(args, "/f") is not None:
+        sqlPath = get_option(args, "/f")
+        base = os.path.splitext(os.path.basename(sqlPath))[0]
+        with sql_index.MappedSQLFile(sqlPath) as sql_file:
+            units = [sql_file.text(entry) for entry in sql_index.load_index(sqlPath)['statements']]
+        sizes = [len(unit.encode("utf-8")) for unit in units]
+    else:
+        sqlPath = get_option(args, "/d")
+        base = os.path.basename(os.path.normpath(sqlPath))
+        units = sql_dedup.list_sql_files(sqlPath)
+        sizes = [os.path.getsize(path) for path in units]
+    if len(units) < 2:
+        return None
+    batches = min(batches, len(units))
+    groups = [[]]
+    filled = 0
+    for unit, size in zip(units, sizes):
+        if groups[-1] and filled >= sum(sizes) * len(groups) / batches and len(groups) < batches:
+            groups.append([])
+        groups[-1].append(unit)
+        filled += size
+
+    tempRoot = tempfile.mkdtemp(prefix="dlineage_batches_")
+    batchDirs = []
+    for number, group in enumerate(groups, 1):
+        batchDir = os.path.join(tempRoot, "%s_part%d" % (base, number))
+        os.makedirs(batchDir)
+        if get_option(args, "/f") is not None:
+            with open(os.path.join(batchDir, os.path.basename(sqlPath)), 'w', encoding='utf-8') as f:
+                f.write("\n\n".join(text if text.rstrip().endswith(";") else text + ";" for text in group) + "\n")
         else:
-            print("Please specify a sql file path or directory path to analyze dlineage.")
+            # Numbered links keep the files in their original order
+            for position, path in enumerate(group):
+                os.symlink(os.path.abspath(path), os.path.join(batchDir, "%05d_%s" % (position, os.path.basename(path))))
+        batchDirs.append(batchDir)
+    return tempRoot, batchDirs
+
+def recover_from_oom(args, heap_mb):
+    """
+    The analysis ran out of memory and the JVM cannot be restarted in this process.
+    Re-execute with a doubled heap while the container has room for it, otherwise analyze the input in batches
+    (each in a child process that can split further), and report what was done.
+    """
+    attempt = int(os.environ.get(OOM_ATTEMPT_ENV, "0"))
+    limit_mb = max_heap_mb(memory_share_mb(args))
+    heap_mb = heap_mb or HEAP_MIN_MB
+    next_heap_mb = heap_mb * 2 if limit_mb is None else min(heap_mb * 2, limit_mb)
+    print("OutOfMemoryError with -Xmx%dm" % heap_mb)
+    sys.stdout.flush()
+    env = dict(os.environ)
+    if attempt < OOM_MAX_RETRIES and next_heap_mb > heap_mb:
+        print("Retrying with -Xmx%dm (retry %d of %d)" % (next_heap_mb, attempt + 1, OOM_MAX_RETRIES))
+        sys.stdout.flush()
+        env[OOM_ATTEMPT_ENV] = str(attempt + 1)
+        os.execve(sys.executable, [sys.executable] + with_option(args, "/maxHeap", "%dm" % next_heap_mb), env)
+
+    split = split_into_batches(args, OOM_BATCHES)
+    if split is None:
+        print("The input cannot be split further; giving up.")
+        sys.exit(OOM_EXIT_CODE)
+    tempRoot, batchDirs = split
+    print("Analyzing the input in %d batches with -Xmx%dm (lineage across batches is not connected)"
+          % (len(batchDirs), heap_mb))
+    sys.stdout.flush()
+    # Batches do not retry with a larger heap again, they only split further
+    env[OOM_ATTEMPT_ENV] = str(OOM_MAX_RETRIES)
+    batchArgs = [arg for position, arg in enumerate(args)
+                 if arg not in ("/f", "/d") and args[position - 1] not in ("/f", "/d")]
+    # Output files of the whole input, each replaced by the list of the batch outputs
+    outputs = {}
+    if indexOf(args, "/graph") != -1:
+        outputs[graph_output_path(args)] = []
+    if indexOf(args, "/er") != -1:
+        outputs[er_output_path(args)] = []
+    graphName = os.path.splitext(os.path.basename(graph_output_path(args)))[0][len("lineageGraph_"):]
+    failed = []
+    try:
+        for number, batchDir in enumerate(batchDirs, 1):
+            batchDirArgs = with_option(with_option(batchArgs, "/maxHeap", "%dm" % heap_mb), "/d", batchDir)
+            if indexOf(args, "/graph") != -1 or get_option(args, "/graphName") is not None:
+                batchDirArgs = with_option(batchDirArgs, "/graphName", "%s_part%d" % (graphName, number))
+            if indexOf(args, "/graph") != -1:
+                outputs[graph_output_path(args)].append(graph_output_path(batchDirArgs))
+            if indexOf(args, "/er") != -1:
+                outputs[er_output_path(args)].append(er_output_path(batchDirArgs))
+            returncode = subprocess.call([sys.executable] + batchDirArgs, env=env)
+            print("Batch %s: %s" % (os.path.basename(batchDir), "ok" if returncode == 0 else "failed (%d)" % returncode))
+            if returncode != 0:
+                failed.append(batchDir)
+    finally:
+        shutil.rmtree(tempRoot, ignore_errors=True)
+    print("Analyzed in %d batches, %d failed" % (len(batchDirs), len(failed)))
+    if failed:
+        sys.exit(OOM_EXIT_CODE)
+    for output_path, part_paths in outputs.items():
+        # An output of an earlier run would no longer match the input
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        manifest_path = lineage_io.batch_manifest_path(output_path)
+        save_to_file(manifest_path, json.dumps(part_paths, ensure_ascii=False))
+        print("Batch outputs of %s listed in: %s" % (output_path, manifest_path))
+
+def write_ddl_statements(sql_path):
+    """
+    Write the DDL statements (CREATE/ALTER/DROP of tables, views and indexes, classified as split.py does)
+    of a SQL file or directory to a temporary file. Returns (path, statement count, hash of the DDL text).
+    """
+    digest = hashlib.sha256()
+    count = 0
+    fd, ddlPath = tempfile.mkstemp(prefix="dlineage_ddl_", suffix=".sql")
+    with os.fdopen(fd, 'w', encoding='utf-8') as out:
+        for path in sql_dedup.list_sql_files(sql_path):
+            try:
+                statements = list(sql_index.read_statements(path, types=['ddl']))
+            except UnicodeDecodeError:
+                continue
+            for entry, text in statements:
+                if not text.rstrip().endswith(';'):
+                    text += ';'
+                out.write(text + '\n\n')
+                digest.update(text.encode('utf-8') + b'\0')
+                count += 1
+    return ddlPath, count, digest.hexdigest()
+
+def er_cache_key(args, ddl_hash, vendor, version):
+    """The DDL hash combined with everything else that shapes the ER graph"""
+    options = [arg for position, arg in enumerate(args)
+               if (position > 0 or arg.startswith("/")) and arg not in ER_CACHE_IGNORED_OPTIONS
+               and (position == 0 or args[position - 1] not in ER_CACHE_IGNORED_OPTIONS)]
+    metadataPath = get_option(args, "/env")
+    envHash = sql_index.file_sha256(metadataPath) if metadataPath and os.path.isfile(metadataPath) else None
+    key = json.dumps([ddl_hash, str(vendor), str(version), options, envHash])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def er_output_path(args):
+    # Generate output filename based on /graphName or the input file/directory
+    if get_option(args, "/graphName") is not None:
+        return os.path.join(OUTPUT_DIR, f"erGraph_{get_option(args, '/graphName')}.json")
+    input_path = None
+    if indexOf(args, "/f") != -1 and len(args) > indexOf(args, "/f") + 1:
+        input_path = args[indexOf(args, "/f") + 1]
+    elif indexOf(args, "/d") != -1 and len(args) > indexOf(args, "/d") + 1:
+        input_path = args[indexOf(args, "/d") + 1]
+
+    if input_path:
+        base_name = os.path.basename(input_path).replace('.sql', '').replace('.', '_')
+        output_filename = f"erGraph_{base_name}.json"
+    else:
+        output_filename = "erGraph_default.json"
+    return os.path.join(OUTPUT_DIR, output_filename)
+
+def _java_str(value):
+    return None if value is None else str(value)
+
+def _model_endpoint(column):
+    return {
+        'id': _java_str(column.getId()),
+        'column': _java_str(column.getColumn()),
+        'parent_id': _java_str(column.getParent_id()),
+        'parent_name': _java_str(column.getParent_name()),
+        'coordinates': lineage_io.xml_coordinates(_java_str(column.getCoordinate())),
+    }
+
+def iter_dataflow_model(dataflow):
+    """
+    Yield lineage_io records (as iter_xml_file does for the XML output) from the Java dataflow model,
+    one object at a time
+    """
+    for getter, default_type in DATAFLOW_NODE_LISTS:
+        for table in getattr(dataflow, getter)() or []:
+            tableId = _java_str(table.getId())
+            yield 'table', {
+                'id': tableId,
+                'database': _java_str(table.getDatabase()),
+                'schema': _java_str(table.getSchema()),
+                'name': _java_str(table.getName()),
+                'type': _java_str(table.getType()) or default_type,
+                'coordinates': lineage_io.xml_coordinates(_java_str(table.getCoordinate())),
+            }
+            for column in table.getColumns() or []:
+                yield 'column', {
+                    'id': _java_str(column.getId()),
+                    'table_id': tableId,
+                    'name': _java_str(column.getName()),
+                    'coordinates': lineage_io.xml_coordinates(_java_str(column.getCoordinate())),
+                }
+    for relationship in dataflow.getRelationships() or []:
+        target = relationship.getTarget()
+        yield 'relation', {
+            'id': _java_str(relationship.getId()),
+            'type': _java_str(relationship.getType()),
+            'effect_type': _java_str(relationship.getEffectType()),
+            'target': _model_endpoint(target) if target is not None else {},
+            'sources': [_model_endpoint(source) for source in relationship.getSources() or []],
+        }
+
+def jvm_heap_usage():
+    runtime = jpype.JClass("java.lang.Runtime").getRuntime()
+    total = int(runtime.totalMemory())
+    return {"used": total - int(runtime.freeMemory()), "committed": total, "max": int(runtime.maxMemory())}
+
+def get_profile_dir(args):
+    if indexOf(args, "/profile") != -1 and len(args) > indexOf(args, "/profile") + 1:
+        return args[indexOf(args, "/profile") + 1]
+    return None
+
+def start_flight_recording():
+    """Start a Java Flight Recorder recording with the built-in 'profile' settings (method sampling)"""
+    try:
+        Recording = jpype.JClass("jdk.jfr.Recording")
+        Configuration = jpype.JClass("jdk.jfr.Configuration")
+    except (TypeError, jpype.JException):
+        print("Java Flight Recorder is not available in this JVM, only the Python profile is recorded.")
+        return None
+    recording = Recording(Configuration.getConfiguration("profile"))
+    recording.setName("dlineage")
+    recording.start()
+    return recording
+
+def _frame_name(frame):
+    method = frame.getMethod()
+    return str(method.getType().getName()) + "." + str(method.getName())
+
+def summarize_flight_recording(jfr_path):
+    """Count JFR execution samples per method (self and total) and per analysis phase"""
+    RecordingFile = jpype.JClass("jdk.jfr.consumer.RecordingFile")
+    File = jpype.JClass("java.io.File")
+    self_samples = {}
+    total_samples = {}
+    phase_samples = {}
+    samples = 0
+    recording_file = RecordingFile(File(jfr_path).toPath())
+    try:
+        while recording_file.hasMoreEvents():
+            event = recording_file.readEvent()
+            if str(event.getEventType().getName()) != "jdk.ExecutionSample" or event.getStackTrace() is None:
+                continue
+            frames = [_frame_name(frame) for frame in event.getStackTrace().getFrames()]
+            if not frames:
+                continue
+            samples += 1
+            self_samples[frames[0]] = self_samples.get(frames[0], 0) + 1
+            for name in set(frames):
+                total_samples[name] = total_samples.get(name, 0) + 1
+            phase = "other"
+            for phase_name, prefixes in PROFILE_PHASES:
+                if any(name.startswith(prefixes) for name in frames):
+                    phase = phase_name
+                    break
+            phase_samples[phase] = phase_samples.get(phase, 0) + 1
+    finally:
+        recording_file.close()
+    return samples, self_samples, total_samples, phase_samples
+
+def _format_samples(counts, samples):
+    lines = []
+    for name, count in sorted(counts.items(), key=lambda item: -item[1])[:PROFILE_TOP]:
+        lines.append(f"  {count * 100.0 / samples:5.1f}%  {count:6d}  {name}")
+    return lines
+
+def write_profile(profile_dir, args, profiler, recording, elapsed):
+    """Write the Python profile, the JFR recording and a short hot-method summary to profile_dir"""
+    pstats_path = os.path.join(profile_dir, "dlineage.pstats")
+    profiler.dump_stats(pstats_path)
+    lines = ["dlineage " + " ".join(args[1:] if args and args[0].endswith(".py") else args),
+             f"Wall time: {elapsed:.3f}s", ""]
+
+    if recording is not None:
+        jfr_path = os.path.join(profile_dir, "dlineage.jfr")
+        recording.stop()
+        recording.dump(jpype.JClass("java.io.File")(jfr_path).toPath())
+        recording.close()
+        samples, self_samples, total_samples, phase_samples = summarize_flight_recording(jfr_path)
+        lines.append(f"Java phases ({samples} execution samples, {jfr_path}):")
+        if samples:
+            for phase_name in [name for name, prefixes in PROFILE_PHASES] + ["other"]:
+                count = phase_samples.get(phase_name, 0)
+                lines.append(f"  {phase_name:<11}{count * 100.0 / samples:5.1f}%  {count:6d}")
+            lines += ["", "Hot Java methods (self):"] + _format_samples(self_samples, samples)
+            lines += ["", "Hot Java methods (total):"] + _format_samples(total_samples, samples)
+        lines.append("")
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    lines += [f"Python ({pstats_path}, by cumulative time):", stream.getvalue()]
+
+    summary_path = os.path.join(profile_dir, "profile_summary.txt")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    print(f"Profile saved to: {profile_dir}")
+
+def run_analysis(args):
+    """analyze(), under cProfile and a flight recording when /profile is given"""
+    try:
+        profile_dir = get_profile_dir(args)
+        if profile_dir is None:
+            analyze(args)
             return
-        simple = indexOf(args, "/s") != -1
-        ignoreTemporaryTable = indexOf(args, "/withTemporaryTable") == -1
-        ignoreResultSets = indexOf(args, "/i") != -1
-        showJoin = indexOf(args, "/j") != -1
-        transform = indexOf(args, "/transform") != -1
-        transformCoordinate = transform and (indexOf(args, "/coor") != -1)
-        textFormat = False
-        linkOrphanColumnToFirstTable = indexOf(args, "/lof") != -1
-        ignoreCoordinate = indexOf(args, "/ic") != -1
-        showImplicitSchema = indexOf(args, "/showImplicitSchema") != -1
-
-        if simple:
-            textFormat = indexOf(args, "/text") != -1
-        traceView = indexOf(args, "/traceView") != -1
-        if traceView:
-            simple = True
-        jsonFormat = indexOf(args, "/json") != -1
-        stat = indexOf(args, "/stat") != -1
-        ignoreFunction = indexOf(args, "/if") != -1
-        topselectlist = indexOf(args, "/topselectlist") != -1
-
-        if indexOf(args, "/s") != -1 and indexOf(args, "/topselectlist") != -1:
-            simple = True
-            topselectlist = True
-        tableLineage = indexOf(args, "/tableLineage") != -1
-        csv = indexOf(args, "/csv") != -1
-        delimiter = args.get(indexOf(args, "/delimiter") + 1) if indexOf(args, "/delimiter") != -1 and len(
-            args) > indexOf(args, "/delimiter") + 1 else ","
-        if tableLineage:
-            simple = False
-            ignoreResultSets = False
-
-        sqlenv = None
-        if indexOf(args, "/env") != -1 and len(args) > indexOf(args, "/env") + 1:
-            metadataFile = File(args[indexOf(args, "/env") + 1])
-            if metadataFile.exists():
-                TJSONSQLEnvParser = jpype.JClass("gudusoft.gsqlparser.sqlenv.parser.TJSONSQLEnvParser")
-                jsonSQLEnvParser = TJSONSQLEnvParser(None, None, None)
-                SQLUtil = jpype.JClass("gudusoft.gsqlparser.util.SQLUtil")
-                envs = jsonSQLEnvParser.parseSQLEnv(vendor, SQLUtil.getFileContent(metadataFile))
-                if envs != None and envs.length > 0:
-                    sqlenv = envs[0]
-        dlineage = DataFlowAnalyzer(sqlFiles, vendor, simple)
-        if sqlenv != None:
-            dlineage.setSqlEnv(sqlenv)
-        dlineage.setTransform(transform)
-        dlineage.setTransformCoordinate(transformCoordinate)
-        dlineage.setShowJoin(showJoin)
-        dlineage.setIgnoreRecordSet(ignoreResultSets)
-        if ignoreResultSets and not ignoreFunction:
-            dlineage.setSimpleShowFunction(True)
-        dlineage.setLinkOrphanColumnToFirstTable(linkOrphanColumnToFirstTable)
-        dlineage.setIgnoreCoordinate(ignoreCoordinate)
-        dlineage.setSimpleShowTopSelectResultSet(topselectlist)
-        dlineage.setShowImplicitSchema(showImplicitSchema)
-        dlineage.setIgnoreTemporaryTable(ignoreTemporaryTable)
-        if simple:
-            dlineage.setShowCallRelation(True)
-        dlineage.setShowConstantTable(indexOf(args, "/showConstant") != -1)
-        dlineage.setShowCountTableColumn(indexOf(args, "/treatArgumentsInCountFunctionAsDirectDataflow") != -1)
-
-        if indexOf(args, "/defaultDatabase") != -1:
-            dlineage.getOption().setDefaultDatabase(args[indexOf(args, "/defaultDatabase") + 1])
-        if indexOf(args, "/defaultSchema") != -1:
-            dlineage.getOption().setDefaultSchema(args[indexOf(args, "/defaultSchema") + 1])
-        if indexOf(args, "/showResultSetTypes") != -1:
-            resultSetTypes = args[indexOf(args, "/showResultSetTypes") + 1]
-            if resultSetTypes is not None:
-                dlineage.getOption().showResultSetTypes(resultSetTypes.split(","))
-
-        if indexOf(args, "/filterRelationTypes") != -1:
-            dlineage.getOption().filterRelationTypes(args[indexOf(args, "/filterRelationTypes") + 1])
-        if simple and not jsonFormat:
-            dlineage.setTextFormat(textFormat)
-
-        if indexOf(args, "/er") != -1:
-            dlineage.getOption().setShowERDiagram(True)
-            dlineage.generateDataFlow()
-            dataflow = dlineage.getDataFlow()
-            DataFlowGraphGenerator = jpype.JClass("gudusoft.gsqlparser.dlineage.graph.DataFlowGraphGenerator")
-            generator = DataFlowGraphGenerator()
-            result = generator.genERGraph(vendor, dataflow)
-            
-            # Generate output filename based on input file/directory
-            input_path = None
-            if indexOf(args, "/f") != -1 and len(args) > indexOf(args, "/f") + 1:
-                input_path = args[indexOf(args, "/f") + 1]
-            elif indexOf(args, "/d") != -1 and len(args) > indexOf(args, "/d") + 1:
-                input_path = args[indexOf(args, "/d") + 1]
-            
-            if input_path:
-                base_name = os.path.basename(input_path).replace('.sql', '').replace('.', '_')
-                output_filename = f"erGraph_{base_name}.json"
-            else:
-                output_filename = "erGraph_default.json"
-            
-            output_path = f"data/output/dlineage/{output_filename}"
-            save_to_file(output_path, str(result))
-            print(f"ER graph output saved to: {output_path}")
-            webbrowser.open_new(widget_server_url + "/er.html")
+        os.makedirs(profile_dir, exist_ok=True)
+        recording = start_flight_recording()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            analyze(args)
+        finally:
+            profiler.disable()
+            write_profile(profile_dir, args, profiler, recording, time.perf_counter() - started)
+    finally:
+        for path in _temp_files:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        del _temp_files[:]
+
+def call_dataFlowAnalyzer(args):
+    heap_mb = start_jvm(args)
+    outOfMemory = False
+    try:
+        run_analysis(args)
+    except Exception as e:
+        if not is_out_of_memory(e):
+            raise
+        outOfMemory = True
+    finally:
+        # Shutdown the JVM when done
+        jpype.shutdownJVM()
+    if outOfMemory:
+        recover_from_oom(args, heap_mb)
+
+def run_worker(args):
+    """
+    Keep one JVM warm and analyze requests read from stdin, one JSON object per line: {"args": [...]}.
+    Each request is answered with one JSON line on stdout; everything the analysis prints
+    (from Python or Java) goes to stderr, or to the file given as "log", so it cannot corrupt the protocol.
+    """
+    global _open_browser
+    _open_browser = False
+    protocol = os.fdopen(os.dup(1), 'w')
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    start_jvm(args)
+    outOfMemory = False
+    try:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            del _written_files[:]
+            started = datetime.now()
+            response = {"status": "ok"}
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict) or not isinstance(request.get("args"), list):
+                    raise ValueError('expected {"args": [...]}')
+            except ValueError as e:
+                # A malformed line is answered like a failed analysis; the worker keeps serving
+                request = None
+                response = {"status": "error", "error": "Invalid request: " + str(e)}
+            if request is not None:
+                logFile = None
+                if request.get("log"):
+                    # Everything this request prints (from Python or Java) goes to its own log file
+                    sys.stderr.flush()
+                    os.makedirs(os.path.dirname(request["log"]) or ".", exist_ok=True)
+                    logFile = open(request["log"], 'ab')
+                    savedStderr = os.dup(2)
+                    os.dup2(logFile.fileno(), 1)
+                    os.dup2(logFile.fileno(), 2)
+                try:
+                    run_analysis(request["args"])
+                except Exception as e:
+                    response = {"status": "error", "error": str(e)}
+                    if is_out_of_memory(e):
+                        # The heap may be left full; answer, then exit so the caller starts a fresh worker
+                        response = {"status": "oom", "error": "java.lang.OutOfMemoryError: " + str(e)}
+                        outOfMemory = True
+                sys.stderr.flush()
+                if logFile is not None:
+                    jpype.JClass("java.lang.System").out.flush()
+                    os.dup2(savedStderr, 1)
+                    os.dup2(savedStderr, 2)
+                    os.close(savedStderr)
+                    logFile.close()
+            response["outputs"] = list(_written_files)
+            response["duration"] = (datetime.now() - started).total_seconds()
+            response["heap"] = jvm_heap_usage()
+            protocol.write(json.dumps(response) + "\n")
+            protocol.flush()
+            if outOfMemory:
+                break
+    finally:
+        jpype.shutdownJVM()
+    if outOfMemory:
+        sys.exit(OOM_EXIT_CODE)
+
+def analyze(args):
+    """Run one analysis in the already started JVM"""
+    widget_server_url = "http://localhost:8000"
+    TGSqlParser = jpype.JClass("gudusoft.gsqlparser.TGSqlParser")
+    DataFlowAnalyzer = jpype.JClass("gudusoft.gsqlparser.dlineage.DataFlowAnalyzer")
+    ProcessUtility = jpype.JClass("gudusoft.gsqlparser.dlineage.util.ProcessUtility")
+    JSON = jpype.JClass("gudusoft.gsqlparser.util.json.JSON")
+    XML2Model = jpype.JClass("gudusoft.gsqlparser.dlineage.util.XML2Model")
+    RemoveDataflowFunction = jpype.JClass("gudusoft.gsqlparser.dlineage.util.RemoveDataflowFunction")
+    File = jpype.JClass("java.io.File")
+    EDbVendor = jpype.JClass("gudusoft.gsqlparser.EDbVendor")
+    vendor = EDbVendor.dbvoracle
+    index = indexOf(args, "/t")
+    if index != -1 and len(args) > index + 1:
+        vendor = TGSqlParser.getDBVendorByName(args[index + 1])
+    if indexOf(args, "/version") != -1:
+        print("Version: " + DataFlowAnalyzer.getVersion())
+        print("Release Date: " + DataFlowAnalyzer.getReleaseDate())
+        return
+
+    if indexOf(args, "/f") != -1 and len(args) > indexOf(args, "/f") + 1:
+        sqlFiles = File(args[indexOf(args, "/f") + 1])
+        if not sqlFiles.exists() or not sqlFiles.isFile():
+            print(args[indexOf(args, "/f") + 1] + " is not a valid file.")
             return
-        elif tableLineage:
-            dlineage.generateDataFlow()
-            originDataflow = dlineage.getDataFlow()
-            if csv:
-                dataflow = ProcessUtility.generateTableLevelLineage(dlineage, originDataflow)
-                result = ProcessUtility.generateTableLevelLineageCsv(dlineage, originDataflow, delimiter)
-            else:
-                dataflow = ProcessUtility.generateTableLevelLineage(dlineage, originDataflow)
-                if jsonFormat:
-                    model = DataFlowAnalyzer.getSqlflowJSONModel(dataflow, vendor)
-                    result = JSON.toJSONString(model)
-                else:
-                    result = XML2Model.saveXML(dataflow)
+
+        character_count = get_file_character_count(args[indexOf(args, "/f") + 1])
+        if character_count > 10000:
+            print("SQLFlow lite version only supports processing SQL statements with a maximum of 10,"
+                  "000 characters. If you need to process SQL statements without length restrictions, "
+                  "please contact support@gudusoft.com for more information.")
+            return
+
+    elif indexOf(args, "/d") != -1 and len(args) > indexOf(args, "/d") + 1:
+        sqlFiles = File(args[indexOf(args, "/d") + 1])
+        if not sqlFiles.exists() or not sqlFiles.isDirectory():
+            print(args[indexOf(args, "/d") + 1] + " is not a valid directory.")
+            return
+        character_count = get_text_files_character_count(args[indexOf(args, "/d") + 1])
+        if character_count > 10000:
+            print("SQLFlow lite version only supports processing SQL statements with a maximum of 10,"
+                  "000 characters. If you need to process SQL statements without length restrictions, "
+                  "please contact support@gudusoft.com for more information.")
+            return
+    else:
+        print("Please specify a sql file path or directory path to analyze dlineage.")
+        return
+    simple = indexOf(args, "/s") != -1
+    ignoreTemporaryTable = indexOf(args, "/withTemporaryTable") == -1
+    ignoreResultSets = indexOf(args, "/i") != -1
+    showJoin = indexOf(args, "/j") != -1
+    transform = indexOf(args, "/transform") != -1
+    transformCoordinate = transform and (indexOf(args, "/coor") != -1)
+    textFormat = False
+    linkOrphanColumnToFirstTable = indexOf(args, "/lof") != -1
+    ignoreCoordinate = indexOf(args, "/ic") != -1
+    showImplicitSchema = indexOf(args, "/showImplicitSchema") != -1
+
+    if simple:
+        textFormat = indexOf(args, "/text") != -1
+    traceView = indexOf(args, "/traceView") != -1
+    if traceView:
+        simple = True
+    jsonFormat = indexOf(args, "/json") != -1
+    stat = indexOf(args, "/stat") != -1
+    ignoreFunction = indexOf(args, "/if") != -1
+    topselectlist = indexOf(args, "/topselectlist") != -1
+
+    if indexOf(args, "/s") != -1 and indexOf(args, "/topselectlist") != -1:
+        simple = True
+        topselectlist = True
+    tableLineage = indexOf(args, "/tableLineage") != -1
+    csv = indexOf(args, "/csv") != -1
+    delimiter = args.get(indexOf(args, "/delimiter") + 1) if indexOf(args, "/delimiter") != -1 and len(
+        args) > indexOf(args, "/delimiter") + 1 else ","
+    if tableLineage:
+        simple = False
+        ignoreResultSets = False
+
+    erCachePath = None
+    if indexOf(args, "/er") != -1 and indexOf(args, "/ddlOnly") != -1:
+        # The ER diagram only depends on DDL: analyze just those statements and reuse the graph while they are unchanged
+        ddlPath, ddlCount, ddlHash = write_ddl_statements(str(sqlFiles.getPath()))
+        _temp_files.append(ddlPath)
+        erCacheKey = er_cache_key(args, ddlHash, vendor, DataFlowAnalyzer.getVersion())
+        erCachePath = os.path.join(ER_CACHE_DIR, erCacheKey + ".json")
+        if os.path.exists(erCachePath):
+            output_path = er_output_path(args)
+            with open(erCachePath, 'r', encoding='utf-8') as f:
+                save_to_file(output_path, f.read())
+            print(f"ER graph output saved to: {output_path} (cached, {ddlCount} DDL statements)")
+            open_browser(widget_server_url + "/er.html")
+            return
+        print(f"Analyzing {ddlCount} DDL statements only")
+        sqlFiles = File(ddlPath)
+
+    sqlenv = None
+    if indexOf(args, "/env") != -1 and len(args) > indexOf(args, "/env") + 1:
+        metadataPath = args[indexOf(args, "/env") + 1]
+        if os.path.isfile(metadataPath):
+            referencedNames = None
+            if indexOf(args, "/envPrune") != -1:
+                referencedNames = collect_referenced_names(str(sqlFiles.getPath()))
+            sqlenv = load_sql_env(vendor, metadataPath, referencedNames)
+
+    dedupPlan = None
+    if indexOf(args, "/dedup") != -1:
+        # Analyze each distinct statement once; relations are mapped back to every copy afterwards.
+        # Constants are part of the output with /showConstant, so statements then only match with equal literals.
+        sqlPath = str(sqlFiles.getPath())
+        dedupPlan = sql_dedup.DedupPlan(sql_dedup.list_sql_files(sqlPath),
+                                        mask_literals=indexOf(args, "/showConstant") == -1)
+        dedupPath = dedupPlan.write_temp()
+        _temp_files.append(dedupPath)
+        sqlFiles = File(dedupPath)
+    if sqlFiles.isDirectory():
+        sqlFiles = File(without_config_files(str(sqlFiles.getPath())))
+    dlineage = DataFlowAnalyzer(sqlFiles, vendor, simple)
+    if sqlenv != None:
+        dlineage.setSqlEnv(sqlenv)
+    dlineage.setTransform(transform)
+    dlineage.setTransformCoordinate(transformCoordinate)
+    dlineage.setShowJoin(showJoin)
+    dlineage.setIgnoreRecordSet(ignoreResultSets)
+    if ignoreResultSets and not ignoreFunction:
+        dlineage.setSimpleShowFunction(True)
+    dlineage.setLinkOrphanColumnToFirstTable(linkOrphanColumnToFirstTable)
+    dlineage.setIgnoreCoordinate(ignoreCoordinate)
+    dlineage.setSimpleShowTopSelectResultSet(topselectlist)
+    dlineage.setShowImplicitSchema(showImplicitSchema)
+    dlineage.setIgnoreTemporaryTable(ignoreTemporaryTable)
+    if simple:
+        dlineage.setShowCallRelation(True)
+    dlineage.setShowConstantTable(indexOf(args, "/showConstant") != -1)
+    dlineage.setShowCountTableColumn(indexOf(args, "/treatArgumentsInCountFunctionAsDirectDataflow") != -1)
+
+    if indexOf(args, "/defaultDatabase") != -1:
+        dlineage.getOption().setDefaultDatabase(args[indexOf(args, "/defaultDatabase") + 1])
+    if indexOf(args, "/defaultSchema") != -1:
+        dlineage.getOption().setDefaultSchema(args[indexOf(args, "/defaultSchema") + 1])
+    if indexOf(args, "/showResultSetTypes") != -1:
+        resultSetTypes = args[indexOf(args, "/showResultSetTypes") + 1]
+        if resultSetTypes is not None:
+            dlineage.getOption().showResultSetTypes(resultSetTypes.split(","))
+
+    if indexOf(args, "/filterRelationTypes") != -1:
+        dlineage.getOption().filterRelationTypes(args[indexOf(args, "/filterRelationTypes") + 1])
+    if simple and not jsonFormat:
+        dlineage.setTextFormat(textFormat)
+
+    if indexOf(args, "/er") != -1:
+        dlineage.getOption().setShowERDiagram(True)
+        dlineage.generateDataFlow()
+        dataflow = dlineage.getDataFlow()
+        DataFlowGraphGenerator = jpype.JClass("gudusoft.gsqlparser.dlineage.graph.DataFlowGraphGenerator")
+        generator = DataFlowGraphGenerator()
+        result = generator.genERGraph(vendor, dataflow)
+
+        output_path = er_output_path(args)
+        save_to_file(output_path, str(result))
+        print(f"ER graph output saved to: {output_path}")
+        if erCachePath is not None:
+            os.makedirs(ER_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{erCachePath}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(str(result))
+            os.replace(tmp_path, erCachePath)
+        open_browser(widget_server_url + "/er.html")
+        return
+    elif tableLineage:
+        dlineage.generateDataFlow()
+        originDataflow = dlineage.getDataFlow()
+        if csv:
+            dataflow = ProcessUtility.generateTableLevelLineage(dlineage, originDataflow)
+            result = ProcessUtility.generateTableLevelLineageCsv(dlineage, originDataflow, delimiter)
         else:
-            result = dlineage.generateDataFlow()
-            dataflow = dlineage.getDataFlow()
-            if csv:
-                dataflow = dlineage.getDataFlow()
-                result = ProcessUtility.generateColumnLevelLineageCsv(dlineage, dataflow, delimiter)
-            elif jsonFormat:
-                dataflow = dlineage.getDataFlow()
-                if ignoreFunction:
-                    dataflow = RemoveDataflowFunction().removeFunction(dataflow, vendor)
+            dataflow = ProcessUtility.generateTableLevelLineage(dlineage, originDataflow)
+            if jsonFormat:
                 model = DataFlowAnalyzer.getSqlflowJSONModel(dataflow, vendor)
                 result = JSON.toJSONString(model)
-            elif traceView:
-                dataflow = dlineage.getDataFlow()
-                result = dlineage.traceView()
-            elif ignoreFunction and result.trim().startsWith("<?xml"):
-                dataflow = dlineage.getDataFlow()
-                dataflow = RemoveDataflowFunction().removeFunction(dataflow, vendor)
+            else:
                 result = XML2Model.saveXML(dataflow)
+    else:
+        result = dlineage.generateDataFlow()
+        dataflow = dlineage.getDataFlow()
+        if csv:
+            dataflow = dlineage.getDataFlow()
+            result = ProcessUtility.generateColumnLevelLineageCsv(dlineage, dataflow, delimiter)
+        elif jsonFormat:
+            dataflow = dlineage.getDataFlow()
+            if ignoreFunction:
+                dataflow = RemoveDataflowFunction().removeFunction(dataflow, vendor)
+            model = DataFlowAnalyzer.getSqlflowJSONModel(dataflow, vendor)
+            result = JSON.toJSONString(model)
+        elif traceView:
+            dataflow = dlineage.getDataFlow()
+            result = dlineage.traceView()
+        elif ignoreFunction and result.trim().startsWith("<?xml"):
+            dataflow = dlineage.getDataFlow()
+            dataflow = RemoveDataflowFunction().removeFunction(dataflow, vendor)
+            result = XML2Model.saveXML(dataflow)
 
-        if result != None:
-            print(result)
-        if dataflow != None and indexOf(args, "/graph") != -1:
-            DataFlowGraphGenerator = jpype.JClass("gudusoft.gsqlparser.dlineage.graph.DataFlowGraphGenerator")
-            generator = DataFlowGraphGenerator()
-            result = generator.genDlineageGraph(vendor, False, dataflow)
-            # Generate output filename based on input file/directory
-            input_path = None
-            if indexOf(args, "/f") != -1 and len(args) > indexOf(args, "/f") + 1:
-                input_path = args[indexOf(args, "/f") + 1]
-            elif indexOf(args, "/d") != -1 and len(args) > indexOf(args, "/d") + 1:
-                input_path = args[indexOf(args, "/d") + 1]
-            
-            if input_path:
-                output_filename = generate_output_filename(input_path)
-            else:
-                output_filename = "lineageGraph_default.json"
-            
-            output_path = f"data/output/dlineage/{output_filename}"
+    if result != None and dedupPlan is not None:
+        result = dedupPlan.annotate(str(result))
+    if result != None:
+        print(result)
+    if dataflow != None and indexOf(args, "/graph") != -1:
+        DataFlowGraphGenerator = jpype.JClass("gudusoft.gsqlparser.dlineage.graph.DataFlowGraphGenerator")
+        generator = DataFlowGraphGenerator()
+        result = generator.genDlineageGraph(vendor, False, dataflow)
+        output_path = graph_output_path(args)
+        document = json.loads(str(result))
+        if dedupPlan is not None:
+            save_to_file(output_path, json.dumps(dedupPlan.annotate_document(document), ensure_ascii=False))
+        else:
             save_to_file(output_path, str(result))
-            print(f"JSON output saved to: {output_path}")
-            webbrowser.open_new(widget_server_url)
-        errors = dlineage.getErrorMessages()
-        if not errors.isEmpty():
-            print("Error log:\n")
-        for err in errors:
-            print(err.getErrorMessage())
-
-    finally:
-        # Shutdown the JVM when done
-        jpype.shutdownJVM()
+        print(f"JSON output saved to: {output_path}")
+        # Laid-out table overview and per-table column fragments for fast first render
+        parts_dir = graph_levels.write_graph_levels(output_path, document)
+        print(f"Graph levels saved to: {parts_dir}")
+        # Keep the table/column name search index of the output directory current
+        search_index.index_output(output_path, document)
+        open_browser(widget_server_url)
+    if dataflow != None and indexOf(args, "/edges") != -1 and len(args) > indexOf(args, "/edges") + 1:
+        # Columnar edge list walked straight from the in-memory model, without serializing the lineage to a string
+        edges_dir = args[indexOf(args, "/edges") + 1]
+        manifest = lineage_export.export_edge_list([], edges_dir, records={"dlineage": iter_dataflow_model(dataflow)})
+        print(f"Edge list ({manifest['format']}) saved to: {edges_dir}")
+    if dedupPlan is not None:
+        os.makedirs(DEDUP_REPORT_DIR, exist_ok=True)
+        reportPath = os.path.join(DEDUP_REPORT_DIR, f"dedup_{os.path.basename(os.path.normpath(sqlPath))}.json")
+        with open(reportPath, 'w', encoding='utf-8') as f:
+            json.dump(dedupPlan.report(), f, ensure_ascii=False, indent=2)
+        print(dedupPlan.format_summary())
+        print(f"Dedup report saved to: {reportPath}")
+    errors = dlineage.getErrorMessages()
+    if not errors.isEmpty():
+        print("Error log:\n")
+    for err in errors:
+        print(err.getErrorMessage())
 
 
 if __name__ == "__main__":
@@ -274,9 +1082,9 @@ if __name__ == "__main__":
         print("Usage: java DataFlowAnalyzer [/f <path_to_sql_file>] [/d <path_to_directory_includes_sql_files>] ["
               "/stat] [/s [/topselectlist] [/text] [/withTemporaryTable]] [/i] [/showResultSetTypes "
               "<resultset_types>] [/ic] [/lof] [/j] [/json] [/traceView] [/t <database type>] [/o <output file path>] "
-              "[/version] [/env <path_to_metadata.json>]  [/tableLineage [/csv [/delimeter <delimeter>]]] [/transform "
+              "[/version] [/env <path_to_metadata.json> [/envPrune]]  [/tableLineage [/csv [/delimeter <delimeter>]]] [/transform "
               "[/coor]] [/showConstant] [/treatArgumentsInCountFunctionAsDirectDataflow] [/filterRelationTypes "
-              "<relationTypes>]")
+              "<relationTypes>] [/maxHeap <size>] [/jobs <n>] [/gcLog <path>] [/graphName <name>] [/edges <output_dir>] [/profile <output_dir>] [/dedup] [/er [/ddlOnly]] [/worker]")
         print("/f: Optional, the full path to SQL file.")
         print("/d: Optional, the full path to the directory includes the SQL files.")
         print("/j: Optional, return the result including the join relation.")
@@ -305,6 +1113,7 @@ if __name__ == "__main__":
               + "sqlserver,mysql,netezza,odbc,openedge,oracle,postgresql,postgres,redshift,snowflake,\n"
               + "sybase,teradata,soql,vertica\n, " + "the default value is oracle")
         print("/env: Optional, specify a metadata.json to get the database metadata information.")
+        print("/envPrune: Optional, only load the metadata of tables referenced by the input SQL.")
         print("/transform: Optional, output the relation transform code.")
         print("/coor: Optional, output the relation transform coordinate, but not the code.")
         print("/defaultDatabase: Optional, specify the default schema.")
@@ -316,7 +1125,27 @@ if __name__ == "__main__":
         print("/filterRelationTypes: Optional, support fdd, fdr, join, call, er, multiple relatoin types separated by "
               "commas")
         print("/graph: Optional, Open a browser page to graphically display the  results")
+        print("/graphName: Optional, write the /graph and /er outputs as lineageGraph_<name>.json and "
+              "erGraph_<name>.json instead of naming them after "
+              "the input.")
         print("/er: Optional, Open a browser page and display the ER diagram graphically")
+        print("/ddlOnly: Optional, with /er, analyze only the DDL statements and reuse the ER graph while they are "
+              "unchanged. The 10,000-character limit applies to the whole input, DML included.")
+        print("/maxHeap: Optional, the maximum JVM heap size, e.g. 2g or 512m. By default it is sized from the input "
+              "and the available memory; on OutOfMemoryError the analysis is retried with a larger heap or in batches.")
+        print("/jobs: Optional, the number of dlineage processes running side by side; the default heap and its "
+              "limit are sized from an equal share of the available memory.")
+        print("/gcLog: Optional, write the JVM garbage collection log to the file.")
+        print("/edges: Optional, export the column-level lineage as a parquet (or .npy) edge list to the directory.")
+        print("/profile: Optional, record a Java Flight Recording and a Python cProfile of the analysis and write them "
+              "with a hot-method summary to the directory.")
+        print("/dedup: Optional, analyze each distinct statement (ignoring comments, whitespace, case and literals) "
+              "once and list every source location of a relation in the output.")
+        print("/worker: Optional, keep the JVM running and analyze JSON requests ({\"args\": [...]}) read line by line "
+              "from stdin, answering each with one JSON line on stdout.")
         sys.exit(0)
 
-    call_dataFlowAnalyzer(args)
+    if indexOf(args, "/worker") != -1:
+        run_worker(args)
+    else:
+        call_dataFlowAnalyzer(args)
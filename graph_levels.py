@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Precompute a table-level overview and per-table column fragments of a lineageGraph_*.json.
+
+Output layout (next to the graph file):
+
+  lineageGraph_<name>.parts/
+    index.json             tables of the overview: [{id, name, columns, fragment}]
+    overview.json          one node per table, one edge per connected table pair, already laid out
+    columns/<tableId>.json the table with all its columns plus the connected columns of its neighbours
+
+Every file is a complete widget document, so the page renders it with visualizeJSON(json, {layout: false})
+and skips the client-side layout of the full column-level graph.
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Sizes the widget uses for table nodes (canvas.graph.name/field height) and its default layout spacing
+NAME_HEIGHT = 22
+FIELD_HEIGHT = 16
+TABLE_WIDTH = 160
+RANKSEP = 100
+NODESEP = 20
+
+# Barycenter sweeps (down and up) used to reduce edge crossings
+ORDER_ITERATIONS = 4
+
+
+def _break_cycles(nodes: List[str], edges: Set[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+    """Drop the back edges found by an iterative DFS so the graph can be layered"""
+    successors = defaultdict(list)
+    for source, target in sorted(edges):
+        if source != target:
+            successors[source].append(target)
+    state = {}
+    acyclic = set()
+    for root in nodes:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if state.get(child) == 1:
+                    continue
+                acyclic.add((node, child))
+                if child not in state:
+                    state[child] = 1
+                    stack.append((child, iter(successors[child])))
+                    break
+            else:
+                state[node] = 2
+                stack.pop()
+    return acyclic
+
+
+def _assign_layers(nodes: List[str], edges: Set[Tuple[str, str]]) -> Dict[str, int]:
+    """Longest-path layering: every node sits one layer right of its furthest predecessor"""
+    successors = defaultdict(list)
+    indegree = {node: 0 for node in nodes}
+    for source, target in edges:
+        successors[source].append(target)
+        indegree[target] += 1
+    layer = {node: 0 for node in nodes}
+    queue = [node for node in nodes if indegree[node] == 0]
+    while queue:
+        node = queue.pop()
+        for target in successors[node]:
+            layer[target] = max(layer[target], layer[node] + 1)
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                queue.append(target)
+    return layer
+
+
+def _order_layers(layers: List[List[str]], edges: Set[Tuple[str, str]]) -> List[List[str]]:
+    """Reorder each layer by the mean position of its neighbours in the previous layer"""
+    predecessors = defaultdict(list)
+    successors = defaultdict(list)
+    for source, target in edges:
+        predecessors[target].append(source)
+        successors[source].append(target)
+
+    def sweep(ordered, neighbours):
+        for index in range(1, len(ordered)):
+            position = {node: i for i, node in enumerate(ordered[index - 1])}
+
+            def barycenter(item):
+                i, node = item
+                linked = [position[n] for n in neighbours[node] if n in position]
+                return sum(linked) / len(linked) if linked else i
+
+            ordered[index] = [node for _, node in sorted(enumerate(ordered[index]), key=barycenter)]
+
+    for _ in range(ORDER_ITERATIONS):
+        sweep(layers, predecessors)
+        layers.reverse()
+        sweep(layers, successors)
+        layers.reverse()
+    return layers
+
+
+def layered_layout(nodes: List[str], heights: Dict[str, int], edges: Iterable[Tuple[str, str]]) -> Dict[str, Tuple[int, int]]:
+    """Left-to-right layered layout (same direction and spacing as the widget); returns {node: (x, y)}"""
+    acyclic = _break_cycles(nodes, set(edges))
+    layer = _assign_layers(nodes, acyclic)
+    layers = [[] for _ in range(max(layer.values(), default=-1) + 1)]
+    for node in nodes:
+        layers[layer[node]].append(node)
+    layers = _order_layers(layers, acyclic)
+
+    positions = {}
+    for index, ordered in enumerate(layers):
+        y = 0
+        for node in ordered:
+            positions[node] = (index * (TABLE_WIDTH + RANKSEP), y)
+            y += heights[node] + NODESEP
+    return positions
+
+
+def _table_node(table_id: str, label: str, columns: List[Dict], position: Tuple[int, int]) -> Dict:
+    return {
+        'id': table_id,
+        'label': {'content': label},
+        'columns': columns,
+        'x': position[0],
+        'y': position[1],
+        'width': TABLE_WIDTH,
+        'height': NAME_HEIGHT + FIELD_HEIGHT * len(columns),
+    }
+
+
+def _column_node(column: Dict) -> Dict:
+    return {'id': column['id'], 'label': {'content': column['label']['content']}}
+
+
+def _is_table_item(item) -> bool:
+    return isinstance(item, dict) and 'columns' in item and 'id' in item
+
+
+def _dbobjs_skeleton(node, path: Tuple, locations: Dict[str, Tuple]):
+    """
+    Copy dbobjs without its tables, views and other column containers, recording where each of them lived:
+    locations[id] = (order, path of the list in the skeleton, item).
+    """
+    if isinstance(node, dict):
+        return {key: _dbobjs_skeleton(value, path + (key,), locations) for key, value in node.items()}
+    if isinstance(node, list):
+        skeleton = []
+        for item in node:
+            if _is_table_item(item):
+                locations[str(item['id'])] = (len(locations), path, item)
+            else:
+                skeleton.append(_dbobjs_skeleton(item, path + (len(skeleton),), locations))
+        return skeleton
+    return node
+
+
+def _document(template: Dict, tables: List[Dict], edges: List[Dict], list_id_map: Dict,
+              relationship_id_map: Dict, sqlflow: Dict) -> Dict:
+    document = {key: value for key, value in template.items() if key != 'data'}
+    data = {key: value for key, value in template['data'].items() if key not in ('graph', 'sqlflow')}
+    data['graph'] = {
+        'elements': {'tables': tables, 'edges': edges},
+        'tooltip': template['data']['graph'].get('tooltip', {}),
+        'listIdMap': list_id_map,
+        'relationshipIdMap': relationship_id_map,
+    }
+    data['sqlflow'] = sqlflow
+    document['data'] = data
+    return document
+
+
+class GraphLevels:
+    """Index of a full column-level graph document used to cut out the overview and the fragments"""
+
+    def __init__(self, document: Dict):
+        self.document = document
+        graph = document['data']['graph']
+        self.sqlflow = document['data'].get('sqlflow') or {}
+        self.list_id_map = graph.get('listIdMap') or {}
+        self.relationship_id_map = graph.get('relationshipIdMap') or {}
+        self.tables = {table['id']: table for table in graph['elements']['tables']}
+        self.table_order = [table['id'] for table in graph['elements']['tables']]
+        self.table_index = {table_id: index for index, table_id in enumerate(self.table_order)}
+        self.column_table = {}
+        for table in graph['elements']['tables']:
+            for column in table['columns']:
+                self.column_table[column['id']] = table['id']
+        self.edges = [edge for edge in graph['elements']['edges']
+                      if edge['sourceId'] in self.column_table and edge['targetId'] in self.column_table]
+        self.table_edges = defaultdict(list)
+        for edge in self.edges:
+            self.table_edges[self.column_table[edge['sourceId']]].append(edge)
+            self.table_edges[self.column_table[edge['targetId']]].append(edge)
+        self.relations = {str(relation.get('id')): relation for relation in self.sqlflow.get('relationships') or []}
+        self.dbobjs_locations = {}
+        self.dbobjs_skeleton = _dbobjs_skeleton(self.sqlflow.get('dbobjs'), (), self.dbobjs_locations)
+
+    def _dbobjs(self, table_graph_ids: Iterable[str], column_graph_ids: Iterable[str] = ()):
+        """dbobjs holding only the given tables, each with only the given columns"""
+        dbobjs = copy.deepcopy(self.dbobjs_skeleton)
+        table_dbo_ids = self._dbo_ids(table_graph_ids)
+        column_dbo_ids = self._dbo_ids(column_graph_ids)
+        locations = sorted(self.dbobjs_locations[dbo_id] for dbo_id in table_dbo_ids
+                           if dbo_id in self.dbobjs_locations)
+        for _, path, item in locations:
+            container = dbobjs
+            for key in path:
+                container = container[key]
+            columns = [column for column in item['columns'] if str(column.get('id')) in column_dbo_ids]
+            container.append(dict(item, columns=columns))
+        return dbobjs
+
+    def _dbo_ids(self, graph_ids: Iterable[str]) -> Set[str]:
+        return {str(dbo_id) for graph_id in graph_ids for dbo_id in self.list_id_map.get(graph_id, [])}
+
+    def _relation_type(self, edge_id: str) -> str:
+        value = self.relationship_id_map.get(edge_id)
+        if isinstance(value, list):
+            return value[1] if len(value) > 1 else 'fdd'
+        return value or 'fdd'
+
+    def table_name(self, table_id: str) -> str:
+        return self.tables[table_id]['label']['content']
+
+    def overview(self) -> Dict:
+        pairs = {}
+        for edge in self.edges:
+            source = self.column_table[edge['sourceId']]
+            target = self.column_table[edge['targetId']]
+            if source == target:
+                continue
+            # A table pair is drawn as a direct (solid) edge if any of its column edges is fdd
+            relation_type = self._relation_type(edge['id'])
+            current = pairs.get((source, target))
+            if current is None or (current != 'fdd' and relation_type == 'fdd'):
+                pairs[(source, target)] = relation_type
+
+        heights = {table_id: NAME_HEIGHT + FIELD_HEIGHT for table_id in self.table_order}
+        positions = layered_layout(self.table_order, heights, pairs)
+        tables = []
+        for table_id in self.table_order:
+            count = len(self.tables[table_id]['columns'])
+            summary = {'id': f"{table_id}::columns", 'label': {'content': f"{count} columns"}}
+            tables.append(_table_node(table_id, self.table_name(table_id), [summary], positions[table_id]))
+        edges = []
+        relationship_id_map = {}
+        for index, ((source, target), relation_type) in enumerate(sorted(pairs.items())):
+            edge_id = f"e{index}"
+            edges.append({'id': edge_id, 'sourceId': f"{source}::columns", 'targetId': f"{target}::columns"})
+            relationship_id_map[edge_id] = ['', relation_type]
+        list_id_map = {table_id: self.list_id_map[table_id] for table_id in self.table_order
+                       if table_id in self.list_id_map}
+        sqlflow = {
+            'dbobjs': self._dbobjs(list_id_map),
+            'relationships': [],
+            'processes': self.sqlflow.get('processes') or [],
+        }
+        return _document(self.document, tables, edges, list_id_map, relationship_id_map, sqlflow)
+
+    def fragment(self, table_id: str) -> Dict:
+        """The table with all of its columns and, for its neighbours, only the columns linked to it"""
+        edges = self.table_edges.get(table_id, [])
+        columns = {table_id: {column['id'] for column in self.tables[table_id]['columns']}}
+        pairs = set()
+        for edge in edges:
+            source = self.column_table[edge['sourceId']]
+            target = self.column_table[edge['targetId']]
+            columns.setdefault(source, set()).add(edge['sourceId'])
+            columns.setdefault(target, set()).add(edge['targetId'])
+            pairs.add((source, target))
+
+        table_ids = sorted(columns, key=self.table_index.get)
+        nodes = {}
+        for t in table_ids:
+            nodes[t] = [_column_node(column) for column in self.tables[t]['columns'] if column['id'] in columns[t]]
+        heights = {t: NAME_HEIGHT + FIELD_HEIGHT * len(nodes[t]) for t in table_ids}
+        positions = layered_layout(table_ids, heights, pairs)
+        tables = [_table_node(t, self.table_name(t), nodes[t], positions[t]) for t in table_ids]
+
+        graph_ids = set(table_ids)
+        for t in table_ids:
+            graph_ids.update(columns[t])
+        list_id_map = {graph_id: self.list_id_map[graph_id] for graph_id in sorted(graph_ids)
+                       if graph_id in self.list_id_map}
+        relationship_id_map = {edge['id']: self.relationship_id_map[edge['id']] for edge in edges
+                               if edge['id'] in self.relationship_id_map}
+        relation_ids = {str(value[0]) for value in relationship_id_map.values() if isinstance(value, list) and value}
+        sqlflow = {
+            'dbobjs': self._dbobjs(table_ids, list_id_map),
+            'relationships': [self.relations[r] for r in sorted(relation_ids) if r in self.relations],
+            'processes': self.sqlflow.get('processes') or [],
+        }
+        return _document(self.document, tables, [dict(edge) for edge in edges], list_id_map,
+                         relationship_id_map, sqlflow)
+
+
+def parts_dir_for(graph_path: str) -> str:
+    return os.path.splitext(graph_path)[0] + '.parts'
+
+
+def _write_json(path: str, document: Dict):
+    # json.dumps uses the C encoder; json.dump to a file does not
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(document, ensure_ascii=False, separators=(',', ':')))
+
+
+def write_graph_levels(graph_path: str, document: Dict = None) -> str:
+    """Write the .parts directory for a graph file (document may be passed if already parsed)"""
+    if document is None:
+        with open(graph_path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+    levels = GraphLevels(document)
+
+    parts_dir = parts_dir_for(graph_path)
+    tmp_dir = f"{parts_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(os.path.join(tmp_dir, 'columns'))
+
+    index = []
+    for table_id in levels.table_order:
+        fragment = f"columns/{table_id}.json"
+        _write_json(os.path.join(tmp_dir, fragment), levels.fragment(table_id))
+        index.append({
+            'id': table_id,
+            'name': levels.table_name(table_id),
+            'columns': len(levels.tables[table_id]['columns']),
+            'fragment': fragment,
+        })
+    _write_json(os.path.join(tmp_dir, 'overview.json'), levels.overview())
+    _write_json(os.path.join(tmp_dir, 'index.json'), index)
+
+    # Swap the finished directory in so the page never sees a half-written one
+    old_dir = f"{parts_dir}.{os.getpid()}.old"
+    if os.path.exists(parts_dir):
+        os.rename(parts_dir, old_dir)
+    os.rename(tmp_dir, parts_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return parts_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the table-level overview and column fragments of lineage graphs')
+    parser.add_argument('graph_files', nargs='+', help='lineageGraph_*.json files written by dlineage.py /graph')
+
+    args = parser.parse_args()
+
+    for graph_file in args.graph_files:
+        if not os.path.exists(graph_file):
+            print(f"Error: File '{graph_file}' not found")
+            sys.exit(1)
+        parts_dir = write_graph_levels(graph_file)
+        print(f"Graph levels written to: {parts_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Set, Tuple
+
+import lineage_io
+
+CATEGORIES = ['added', 'removed', 'changed']
+
+
+def _format_node(key: Tuple[str, str]) -> str:
+    return f"{key[0]}.{key[1]}"
+
+
+def collect_edges(root: str) -> Tuple[Dict, Dict]:
+    """
+    Load the column-level edges of one run (an output file or a directory of outputs).
+    Returns ({(source_key, target_key): {(relation_type, effect_type), ...}},
+             {(source_key, target_key): {file name, ...}}).
+    Node ids and coordinates differ between runs, so edges are keyed by qualified column names only;
+    intermediate nodes are scoped by the path relative to root, so the two runs may live under different names.
+    """
+    edges = {}
+    files = {}
+    for path in lineage_io.find_lineage_files(root):
+        scope = lineage_io.output_scope(path, root)
+        name = scope or os.path.basename(path)
+        for source, target, relation in lineage_io.iter_column_edges(lineage_io.iter_lineage(path)):
+            key = (lineage_io.node_key(source, scope), lineage_io.node_key(target, scope))
+            edges.setdefault(key, set()).add((relation['type'], relation['effect_type']))
+            files.setdefault(key, set()).add(name)
+    return edges, files
+
+
+def diff_edges(old_edges: Dict, new_edges: Dict) -> Dict[str, List]:
+    """Compare two edge maps in one pass over each side"""
+    result = {category: [] for category in CATEGORIES}
+    for key, relations in new_edges.items():
+        old_relations = old_edges.get(key)
+        if old_relations is None:
+            result['added'].append((key, None, relations))
+        elif old_relations != relations:
+            result['changed'].append((key, old_relations, relations))
+    for key, relations in old_edges.items():
+        if key not in new_edges:
+            result['removed'].append((key, relations, None))
+    for category in CATEGORIES:
+        result[category].sort(key=lambda item: item[0])
+    return result
+
+
+def _relations_to_list(relations: Set) -> List[str]:
+    return sorted(f"{relation_type}/{effect_type}" for relation_type, effect_type in relations or [])
+
+
+def file_summary(result: Dict[str, List], old_files: Dict, new_files: Dict) -> Dict[str, Dict[str, int]]:
+    """Count differences per output file, so a bulk run shows which job changed"""
+    summary = {}
+    for category in CATEGORIES:
+        for key, _, _ in result[category]:
+            names = new_files.get(key, set()) | old_files.get(key, set())
+            for name in names:
+                counts = summary.setdefault(name, {c: 0 for c in CATEGORIES})
+                counts[category] += 1
+    return dict(sorted(summary.items()))
+
+
+def to_report(result: Dict[str, List], old_edges: Dict, new_edges: Dict, files: Dict) -> Dict:
+    report = {
+        'summary': {
+            'old_edges': len(old_edges),
+            'new_edges': len(new_edges),
+        },
+        'files': files,
+    }
+    for category in CATEGORIES:
+        report['summary'][category] = len(result[category])
+        report[category] = [
+            {
+                'source': _format_node(key[0]),
+                'target': _format_node(key[1]),
+                'old': _relations_to_list(old_relations),
+                'new': _relations_to_list(new_relations),
+            }
+            for key, old_relations, new_relations in result[category]
+        ]
+    return report
+
+
+def print_report(report: Dict, max_show: int, by_file: bool):
+    summary = report['summary']
+    print(f"Edges: {summary['old_edges']} -> {summary['new_edges']}")
+    print(f"Added: {summary['added']}, Removed: {summary['removed']}, Changed: {summary['changed']}")
+    if by_file and report['files']:
+        print("\nBy file:")
+        for name, counts in report['files'].items():
+            print(f"  {name}: +{counts['added']} -{counts['removed']} ~{counts['changed']}")
+    marks = {'added': '+', 'removed': '-', 'changed': '~'}
+    for category in CATEGORIES:
+        items = report[category]
+        if not items:
+            continue
+        print(f"\n{category.capitalize()}:")
+        for item in items[:max_show]:
+            relations = item['new'] if category == 'added' else item['old']
+            if category == 'changed':
+                relations = item['old'] + ['->'] + item['new']
+            print(f"  {marks[category]} {item['source']} -> {item['target']} [{' '.join(relations)}]")
+        if len(items) > max_show:
+            print(f"  ... and {len(items) - max_show} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the column-level lineage of two dlineage runs')
+    parser.add_argument('old', help='Old lineage output (XML, /json or lineageGraph_*.json) or directory of outputs')
+    parser.add_argument('new', help='New lineage output or directory of outputs')
+    parser.add_argument('--json', dest='json_file', help='Write the full report to this JSON file')
+    parser.add_argument('--max-show', type=int, default=20, help='Edges to print per category (default: 20)')
+    parser.add_argument('--fail-on', default='',
+                        help='Exit with status 1 if any of these categories is not empty, e.g. removed,changed')
+
+    args = parser.parse_args()
+
+    fail_on = [category.strip() for category in args.fail_on.split(',') if category.strip()]
+    for category in fail_on:
+        if category not in CATEGORIES:
+            print(f"Error: Unknown category '{category}' (choose from {', '.join(CATEGORIES)})")
+            sys.exit(2)
+    for path in (args.old, args.new):
+        if not os.path.exists(path):
+            print(f"Error: File '{path}' not found")
+            sys.exit(2)
+
+    old_edges, old_files = collect_edges(args.old)
+    new_edges, new_files = collect_edges(args.new)
+    result = diff_edges(old_edges, new_edges)
+    report = to_report(result, old_edges, new_edges, file_summary(result, old_files, new_files))
+
+    print_report(report, args.max_show, os.path.isdir(args.old) or os.path.isdir(args.new))
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nReport written to: {args.json_file}")
+
+    failed = [category for category in fail_on if report['summary'][category]]
+    if failed:
+        print(f"\nLineage differences found: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Export column-level lineage as a dictionary-encoded edge list.
+
+Output layout (OUTPUT_DIR):
+
+  parquet (when pyarrow is installed)
+    nodes.parquet  id:int32, database, schema, table, column, type   (dictionary-encoded strings)
+    edges.parquet  source_id:int32, target_id:int32, relation_type, effect_type, file
+
+  npy (fallback, readable with numpy.load)
+    nodes/{id,database,schema,table,column,type}.npy    little-endian int32 arrays
+    edges/{source_id,target_id,relation_type,effect_type,file}.npy
+    manifest.json  row counts and the dictionaries: string column values are codes
+                   into manifest["dictionaries"][<column>] (-1 means null)
+
+Rows are written in chunks of CHUNK_ROWS so no single large string or table is built.
+"""
+import argparse
+import array
+import json
+import os
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import lineage_io
+
+CHUNK_ROWS = 65536
+
+NODE_COLUMNS = ['database', 'schema', 'table', 'column', 'type']
+EDGE_COLUMNS = ['relation_type', 'effect_type', 'file']
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class Dictionary:
+    """Maps strings to dense int codes"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class EdgeListBuilder:
+    """
+    Collects nodes and edges from lineage records, deduplicating nodes by qualified column name.
+    Intermediate results are only shared within one file (see lineage_io.node_key).
+    """
+
+    def __init__(self, on_edge_chunk=None):
+        self.dictionaries = {name: Dictionary() for name in NODE_COLUMNS + EDGE_COLUMNS}
+        self.node_ids = {}
+        self.nodes = {name: array.array('i') for name in NODE_COLUMNS}
+        self.edges = {name: array.array('i') for name in ['source_id', 'target_id'] + EDGE_COLUMNS}
+        self.edge_count = 0
+        self.on_edge_chunk = on_edge_chunk
+
+    def _node(self, endpoint: Dict, file_name: str) -> int:
+        key = lineage_io.node_key(endpoint, file_name)
+        node_id = self.node_ids.get(key)
+        if node_id is None:
+            node_id = len(self.node_ids)
+            self.node_ids[key] = node_id
+            for name in NODE_COLUMNS:
+                value = endpoint[name]
+                if name in ('database', 'schema'):
+                    value = lineage_io.clean_name(value)
+                self.nodes[name].append(self.dictionaries[name].encode(value))
+        return node_id
+
+    def add_file(self, path: str, records=None):
+        """Add every relation of one dlineage output file"""
+        file_name = os.path.basename(path)
+        file_code = self.dictionaries['file'].encode(file_name)
+        if records is None:
+            records = lineage_io.iter_lineage(path)
+        for source, target, relation in lineage_io.iter_column_edges(records):
+            self._edge(self._node(source, file_name), self._node(target, file_name), relation['type'],
+                       relation['effect_type'], file_code)
+
+    def _edge(self, source_id: int, target_id: int, relation_type, effect_type, file_code: int):
+        self.edges['source_id'].append(source_id)
+        self.edges['target_id'].append(target_id)
+        self.edges['relation_type'].append(self.dictionaries['relation_type'].encode(relation_type))
+        self.edges['effect_type'].append(self.dictionaries['effect_type'].encode(effect_type))
+        self.edges['file'].append(file_code)
+        self.edge_count += 1
+        if self.on_edge_chunk and len(self.edges['source_id']) >= CHUNK_ROWS:
+            self.flush_edges()
+
+    def flush_edges(self):
+        """Hand buffered edges to the writer and start a new chunk"""
+        if self.on_edge_chunk and len(self.edges['source_id']):
+            self.on_edge_chunk(self.edges)
+            self.edges = {name: array.array('i') for name in self.edges}
+
+
+def _write_npy(path: str, values: array.array):
+    """Write an int32 array in NumPy .npy format (version 1.0) without requiring numpy"""
+    if sys.byteorder == 'big':
+        values = array.array('i', values)
+        values.byteswap()
+    header = "{'descr': '<i4', 'fortran_order': False, 'shape': (%d,), }" % len(values)
+    # Pad so that the data starts on a 64-byte boundary
+    header += ' ' * (63 - (10 + len(header)) % 64) + '\n'
+    with open(path, 'wb') as f:
+        f.write(b'\x93NUMPY\x01\x00')
+        f.write(len(header).to_bytes(2, 'little'))
+        f.write(header.encode('latin1'))
+        view = memoryview(values).cast('B')
+        chunk = CHUNK_ROWS * values.itemsize
+        for offset in range(0, len(view), chunk):
+            f.write(view[offset:offset + chunk])
+
+
+def _arrow_columns(columns: Dict[str, array.array], dictionaries: Dict[str, Dictionary]) -> Dict:
+    arrays = {}
+    for name, codes in columns.items():
+        if name in dictionaries:
+            indices = pyarrow.array([code if code >= 0 else None for code in codes], type=pyarrow.int32())
+            arrays[name] = pyarrow.DictionaryArray.from_arrays(
+                indices, pyarrow.array(dictionaries[name].values, type=pyarrow.string()))
+        else:
+            arrays[name] = pyarrow.array(codes, type=pyarrow.int32())
+    return arrays
+
+
+class ParquetWriter:
+    """Writes edges.parquet one row group per chunk, then nodes.parquet"""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.writer = None
+
+    def write_edges(self, edges: Dict[str, array.array], dictionaries: Dict[str, Dictionary]):
+        # Dictionaries grow while edges stream in, so each row group embeds the current dictionary
+        table = pyarrow.table(_arrow_columns(edges, dictionaries))
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(os.path.join(self.output_dir, 'edges.parquet'), table.schema)
+        self.writer.write_table(table)
+
+    def close(self, nodes: Dict[str, array.array], dictionaries: Dict[str, Dictionary]):
+        if self.writer is not None:
+            self.writer.close()
+        columns = {'id': array.array('i', range(len(next(iter(nodes.values())))))}
+        columns.update(nodes)
+        pyarrow.parquet.write_table(pyarrow.table(_arrow_columns(columns, dictionaries)),
+                                    os.path.join(self.output_dir, 'nodes.parquet'), row_group_size=CHUNK_ROWS)
+
+
+class NpyWriter:
+    """Keeps edge codes in compact int32 buffers and writes one .npy file per column"""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.edges = None
+
+    def write_edges(self, edges: Dict[str, array.array], dictionaries: Dict[str, Dictionary]):
+        if self.edges is None:
+            self.edges = {name: array.array('i') for name in edges}
+        for name, values in edges.items():
+            self.edges[name].extend(values)
+
+    def close(self, nodes: Dict[str, array.array], dictionaries: Dict[str, Dictionary]):
+        for table, columns in (('nodes', nodes), ('edges', self.edges or {})):
+            os.makedirs(os.path.join(self.output_dir, table), exist_ok=True)
+            for name, values in columns.items():
+                _write_npy(os.path.join(self.output_dir, table, f'{name}.npy'), values)
+        _write_npy(os.path.join(self.output_dir, 'nodes', 'id.npy'),
+                   array.array('i', range(len(next(iter(nodes.values()))))))
+
+
+def export_edge_list(paths: List[str], output_dir: str, output_format: Optional[str] = None,
+                     records: Optional[Dict[str, Iterator[Tuple[str, Dict]]]] = None) -> Dict:
+    """
+    Export lineage files (or record streams keyed by name, e.g. from the in-memory model) as a node table
+    and an edge table.
+    Returns the manifest describing what was written.
+    """
+    output_format = output_format or ('parquet' if pyarrow else 'npy')
+    if output_format == 'parquet' and pyarrow is None:
+        print("Error: pyarrow is not installed. Please install it using: pip install pyarrow")
+        sys.exit(1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    writer = ParquetWriter(output_dir) if output_format == 'parquet' else NpyWriter(output_dir)
+    builder = EdgeListBuilder(on_edge_chunk=lambda edges: writer.write_edges(edges, builder.dictionaries))
+    for path in paths:
+        builder.add_file(path)
+    for name, stream in (records or {}).items():
+        builder.add_file(name, stream)
+    builder.flush_edges()
+    writer.close(builder.nodes, builder.dictionaries)
+
+    manifest = {
+        'format': output_format,
+        'nodes': len(builder.node_ids),
+        'edges': builder.edge_count,
+        'dictionaries': {name: dictionary.values for name, dictionary in builder.dictionaries.items()},
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export column-level lineage as a dictionary-encoded edge list')
+    parser.add_argument('inputs', nargs='+', help='dlineage outputs (XML, /json or lineageGraph_*.json) or directories')
+    parser.add_argument('output_dir', help='Output directory')
+    parser.add_argument('--format', choices=['parquet', 'npy'],
+                        help='Output format (default: parquet when pyarrow is installed, otherwise npy)')
+
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print(f"Error: File '{path}' not found")
+            sys.exit(1)
+        paths.extend(lineage_io.find_lineage_files(path))
+
+    manifest = export_edge_list(paths, args.output_dir, args.format)
+    print(f"Exported {manifest['nodes']} nodes and {manifest['edges']} edges ({manifest['format']}) to: {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Schema/database placeholders the analyzer uses when a name is not qualified
+DEFAULT_NAMES = ('', 'DEFAULT', 'DEFAULT_SERVER')
+
+# Node types that exist outside one analysis; other nodes (RS-1, select lists, ...) are numbered per output file
+PERSISTENT_TYPES = ('table', 'view')
+
+# Errors raised while reading a file that is not a (complete) lineage output
+PARSE_ERRORS = (ValueError, SyntaxError) if ijson is None else (ValueError, SyntaxError, ijson.JSONError)
+
+_XML_COORDINATE = re.compile(r'\[(\d+),(\d+)')
+
+
+def json_coordinates(coordinates) -> List[Tuple[int, int]]:
+    return [(c.get('x'), c.get('y')) for c in coordinates or [] if isinstance(c, dict)]
+
+
+def xml_coordinates(coordinate: Optional[str]) -> List[Tuple[int, int]]:
+    return [(int(x), int(y)) for x, y in _XML_COORDINATE.findall(coordinate or '')]
+
+
+def find_sqlflow_model(document: Dict) -> Dict:
+    """Locate the {dbobjs, relationships} model in a graph or /json output document"""
+    node = document
+    while isinstance(node, dict) and 'relationships' not in node:
+        for key in ('data', 'sqlflow'):
+            if isinstance(node.get(key), dict):
+                node = node[key]
+                break
+        else:
+            raise ValueError("No lineage relationships found in the document")
+    return node
+
+
+def _walk_dbobjs(node, database: Optional[str], schema: Optional[str]) -> Iterator[Tuple[str, Dict]]:
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk_dbobjs(item, database, schema)
+        return
+    if not isinstance(node, dict):
+        return
+    if 'columns' in node and 'id' in node:
+        table_id = str(node['id'])
+        yield 'table', {
+            'id': table_id,
+            'database': node.get('database', database),
+            'schema': node.get('schema', schema),
+            'name': node.get('name') or node.get('displayName'),
+            'type': node.get('type'),
+            'coordinates': json_coordinates(node.get('coordinates')),
+        }
+        for column in node['columns']:
+            yield 'column', {
+                'id': str(column.get('id')),
+                'table_id': table_id,
+                'name': column.get('name'),
+                'coordinates': json_coordinates(column.get('coordinates')),
+            }
+        return
+    if 'schemas' in node:
+        database = node.get('name', database)
+    elif 'name' in node and any(isinstance(node.get(key), list) for key in ('tables', 'views', 'others')):
+        schema = node.get('name', schema)
+    for key, value in node.items():
+        if isinstance(value, (list, dict)):
+            yield from _walk_dbobjs(value, database, schema)
+
+
+def _json_endpoint(endpoint: Dict) -> Dict:
+    return {
+        'id': str(endpoint.get('id')),
+        'column': endpoint.get('column'),
+        'parent_id': str(endpoint.get('parentId')) if endpoint.get('parentId') is not None else None,
+        'parent_name': endpoint.get('parentName'),
+        'coordinates': json_coordinates(endpoint.get('coordinates')),
+    }
+
+
+def _json_relation(relation: Dict) -> Dict:
+    return {
+        'id': str(relation.get('id')),
+        'type': relation.get('type'),
+        'effect_type': relation.get('effectType'),
+        'target': _json_endpoint(relation.get('target') or {}),
+        'sources': [_json_endpoint(source) for source in relation.get('sources') or []],
+    }
+
+
+def iter_json_document(document: Dict, relations: bool = True) -> Iterator[Tuple[str, Dict]]:
+    """Yield normalized records from an already loaded JSON output"""
+    model = find_sqlflow_model(document)
+    yield from _walk_dbobjs(model.get('dbobjs'), None, None)
+    for relation in model.get('relationships') or [] if relations else []:
+        yield 'relation', _json_relation(relation)
+
+
+def _find_model_prefix(path: str) -> str:
+    """ijson prefix of the {dbobjs, relationships} model, following the same data/sqlflow nesting as find_sqlflow_model"""
+    with open(path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f):
+            if event == 'map_key' and value == 'relationships' and \
+                    all(part in ('data', 'sqlflow') for part in prefix.split('.') if part):
+                return prefix
+    raise ValueError("No lineage relationships found in the document")
+
+
+def iter_json_file(path: str, relations: bool = True) -> Iterator[Tuple[str, Dict]]:
+    """
+    Stream normalized records from a JSON output with ijson.
+    dbobjs (tables and columns) are loaded first, then relationships are read one at a time,
+    so memory does not grow with the number of relations.
+    """
+    prefix = _find_model_prefix(path)
+    model_prefix = f'{prefix}.' if prefix else ''
+    with open(path, 'rb') as f:
+        for dbobjs in ijson.items(f, f'{model_prefix}dbobjs', use_float=True):
+            yield from _walk_dbobjs(dbobjs, None, None)
+    if not relations:
+        return
+    with open(path, 'rb') as f:
+        for relation in ijson.items(f, f'{model_prefix}relationships.item', use_float=True):
+            yield 'relation', _json_relation(relation)
+
+
+def _xml_endpoint(element) -> Dict:
+    return {
+        'id': element.get('id'),
+        'column': element.get('column'),
+        'parent_id': element.get('parent_id'),
+        'parent_name': element.get('parent_name'),
+        'coordinates': xml_coordinates(element.get('coordinate')),
+    }
+
+
+def iter_xml_file(path: str, relations: bool = True) -> Iterator[Tuple[str, Dict]]:
+    """Stream normalized records from a dlineage XML output, clearing parsed elements as it goes"""
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = element
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        if element.tag == 'relationship':
+            if not relations:
+                root.clear()
+                continue
+            targets = element.findall('target')
+            yield 'relation', {
+                'id': element.get('id'),
+                'type': element.get('type'),
+                'effect_type': element.get('effectType'),
+                'target': _xml_endpoint(targets[0]) if targets else {},
+                'sources': [_xml_endpoint(source) for source in element.findall('source')],
+            }
+        else:
+            columns = element.findall('column')
+            if columns or element.tag in ('table', 'view'):
+                table_id = element.get('id')
+                yield 'table', {
+                    'id': table_id,
+                    'database': element.get('database'),
+                    'schema': element.get('schema'),
+                    'name': element.get('name'),
+                    'type': element.get('type') or element.tag,
+                    'coordinates': xml_coordinates(element.get('coordinate')),
+                }
+                for column in columns:
+                    yield 'column', {
+                        'id': column.get('id'),
+                        'table_id': table_id,
+                        'name': column.get('name'),
+                        'coordinates': xml_coordinates(column.get('coordinate')),
+                    }
+        # Finished top-level elements are no longer needed
+        root.clear()
+
+
+def _is_xml(path: str) -> bool:
+    with open(path, 'rb') as f:
+        head = f.read(512).lstrip()
+    return head.startswith(b'<')
+
+
+def iter_lineage(path: str, relations: bool = True) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yield ('table' | 'column' | 'relation', record) tuples from a dlineage output file.
+    Supports the XML output, the /json output and the lineageGraph_*.json graph output.
+    XML is always streamed; JSON is streamed with ijson (in requirements.txt). Without ijson a JSON file is
+    loaded at once, with a warning, since it then has to fit in memory.
+    With relations=False only tables and columns are read.
+    """
+    if _is_xml(path):
+        yield from iter_xml_file(path, relations)
+        return
+    if ijson is not None:
+        yield from iter_json_file(path, relations)
+        return
+    print(f"Warning: ijson is not installed, loading {path} into memory at once. "
+          f"Please install it using: pip install ijson", file=sys.stderr)
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    yield from iter_json_document(document, relations)
+
+
+def find_lineage_files(path: str) -> List[str]:
+    """
+    A lineage file itself, or the XML/JSON outputs directly under a directory in name order.
+    ER diagram outputs (erGraph_*.json) hold no lineage and are skipped.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(os.path.join(path, name) for name in os.listdir(path)
+                  if name.endswith(('.json', '.xml')) and not name.startswith('erGraph_')
+                  and os.path.isfile(os.path.join(path, name)))
+
+
+def batch_manifest_path(output_path: str) -> str:
+    """The list of per-batch outputs dlineage.py writes instead of output_path when it split the input after OOM"""
+    return os.path.splitext(output_path)[0] + '.batches'
+
+
+def resolve_outputs(output_path: str) -> List[str]:
+    """
+    The files holding an analysis output: output_path itself or, when the input was analyzed in batches,
+    the batch outputs from its manifest (batches may have been split again). [] when neither exists.
+    """
+    if os.path.exists(output_path):
+        return [output_path]
+    manifest_path = batch_manifest_path(output_path)
+    if not os.path.isfile(manifest_path):
+        return []
+    with open(manifest_path, encoding='utf-8') as f:
+        parts = json.load(f)
+    return [path for part in parts for path in resolve_outputs(part)]
+
+
+def clean_name(name: Optional[str]) -> Optional[str]:
+    """Treat analyzer placeholders as missing names"""
+    if name is None or name.upper() in DEFAULT_NAMES:
+        return None
+    return name
+
+
+def qualified_table_name(database: Optional[str], schema: Optional[str], name: Optional[str]) -> str:
+    """Canonical lower-case database.schema.table name, skipping parts the name already carries"""
+    parts = [part for part in (name or '').split('.') if part]
+    if len(parts) < 2 and clean_name(schema):
+        parts.insert(0, schema)
+    if len(parts) < 3 and clean_name(database):
+        parts.insert(0, database)
+    return '.'.join(part.strip('"`[]') for part in parts).lower()
+
+
+def _resolve_endpoint(endpoint: Dict, tables: Dict, columns: Dict) -> Dict:
+    column = columns.get(endpoint.get('id'))
+    table = tables.get(column['table_id'] if column else endpoint.get('parent_id'))
+    if table is None:
+        table = {'database': None, 'schema': None, 'name': endpoint.get('parent_name'), 'type': None}
+    return {
+        'database': table['database'],
+        'schema': table['schema'],
+        'table': table['name'],
+        'column': column['name'] if column else endpoint.get('column'),
+        'type': table['type'],
+    }
+
+
+def iter_column_edges(records: Iterator[Tuple[str, Dict]]) -> Iterator[Tuple[Dict, Dict, Dict]]:
+    """
+    Resolve relation endpoints to their tables and yield (source, target, relation) per source column.
+    Endpoints are {database, schema, table, column, type} dicts; ids and coordinates are dropped.
+    """
+    tables = {}
+    columns = {}
+    for kind, record in records:
+        if kind == 'table':
+            tables[record['id']] = record
+        elif kind == 'column':
+            columns[record['id']] = record
+        else:
+            target = _resolve_endpoint(record['target'], tables, columns)
+            for source in record['sources']:
+                yield _resolve_endpoint(source, tables, columns), target, record
+
+
+def scoped_table_name(endpoint: Dict, file_name: Optional[str]) -> str:
+    """
+    Qualified table name of an endpoint.
+    Intermediate results (RS-1, select lists, ...) are numbered per output file, so their names are scoped by file
+    (the path relative to the compared directory; None when a single file is read and no scope is needed).
+    """
+    name = qualified_table_name(endpoint['database'], endpoint['schema'], endpoint['table'])
+    if endpoint['type'] in PERSISTENT_TYPES or not file_name:
+        return name
+    return f"{file_name}:{name}"
+
+
+def output_scope(path: str, root: str) -> Optional[str]:
+    """Scope of an output file read from root: its path relative to a root directory, None for a single file"""
+    if not os.path.isdir(root):
+        return None
+    return os.path.relpath(path, root)
+
+
+def node_key(endpoint: Dict, file_name: Optional[str]) -> Tuple[str, str]:
+    """Run-independent identity of a column: (table name scoped by scoped_table_name, lower-case column name)"""
+    return scoped_table_name(endpoint, file_name), (endpoint['column'] or '').lower()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+import lineage_io
+
+# Node types that are kept as endpoints by --tables-only; everything else is an intermediate result
+PERSISTENT_TYPES = lineage_io.PERSISTENT_TYPES
+
+CSV_FIELDS = ['source', 'target', 'source_type', 'target_type', 'column_edges', 'source_columns', 'target_columns',
+              'relation_types', 'effect_types', 'files']
+
+
+def _new_edge() -> Dict:
+    return {
+        'column_edges': 0,
+        'source_columns': set(),
+        'target_columns': set(),
+        'relation_types': {},
+        'effect_types': {},
+        'files': set(),
+    }
+
+
+def _count(counts: Dict[str, int], value, amount: int = 1):
+    if value is not None:
+        counts[value] = counts.get(value, 0) + amount
+
+
+def rollup(paths: List[str]) -> Tuple[Dict, Dict]:
+    """
+    Aggregate column-level edges to table level, streaming through each file.
+    Returns ({table name: type}, {(source table, target table): aggregate}).
+    Memory grows with the number of distinct tables and columns, not with the number of relations.
+    """
+    tables = {}
+    edges = {}
+    for path in paths:
+        file_name = os.path.basename(path)
+        for source, target, relation in lineage_io.iter_column_edges(lineage_io.iter_lineage(path)):
+            source_table = lineage_io.scoped_table_name(source, file_name)
+            target_table = lineage_io.scoped_table_name(target, file_name)
+            tables.setdefault(source_table, source['type'])
+            tables.setdefault(target_table, target['type'])
+            edge = edges.get((source_table, target_table))
+            if edge is None:
+                edge = edges[(source_table, target_table)] = _new_edge()
+            edge['column_edges'] += 1
+            edge['source_columns'].add((source['column'] or '').lower())
+            edge['target_columns'].add((target['column'] or '').lower())
+            _count(edge['relation_types'], relation['type'])
+            _count(edge['effect_types'], relation['effect_type'])
+            edge['files'].add(file_name)
+    return tables, edges
+
+
+def _merge_hop(edge: Dict, hop: Dict, first: bool, last: bool):
+    if first:
+        edge['source_columns'] |= hop['source_columns']
+    if last:
+        edge['target_columns'] |= hop['target_columns']
+        edge['column_edges'] += hop['column_edges']
+    for name in ('relation_types', 'effect_types'):
+        for value, amount in hop[name].items():
+            _count(edge[name], value, amount)
+    edge['files'] |= hop['files']
+
+
+def collapse_intermediates(tables: Dict, edges: Dict) -> Tuple[Dict, Dict]:
+    """
+    Connect tables and views directly, following paths through intermediate results.
+    Source columns come from the edges leaving the source table, target columns and column edge counts from
+    the edges entering the target table; relation and effect types are summed over every hop on the paths.
+    """
+    outgoing = {}
+    for source, target in edges:
+        outgoing.setdefault(source, []).append((source, target))
+
+    collapsed = {}
+    for source in sorted(outgoing):
+        if tables[source] not in PERSISTENT_TYPES:
+            continue
+        # Hops already merged into a (source, target) pair, so diamond-shaped paths are counted once
+        merged = set()
+        for first_hop in outgoing[source]:
+            stack = [(first_hop, [])]
+            visited = set()
+            while stack:
+                hop, path = stack.pop()
+                node = hop[1]
+                if tables[node] in PERSISTENT_TYPES:
+                    edge = collapsed.get((source, node))
+                    if edge is None:
+                        edge = collapsed[(source, node)] = _new_edge()
+                    hops = path + [hop]
+                    for index, path_hop in enumerate(hops):
+                        first, last = index == 0, index == len(hops) - 1
+                        if (node, path_hop, first, last) not in merged:
+                            merged.add((node, path_hop, first, last))
+                            _merge_hop(edge, edges[path_hop], first, last)
+                    continue
+                if node in visited:
+                    continue
+                visited.add(node)
+                for next_hop in outgoing.get(node, []):
+                    stack.append((next_hop, path + [hop]))
+    persistent = {name: table_type for name, table_type in tables.items() if table_type in PERSISTENT_TYPES}
+    return persistent, collapsed
+
+
+def _format_counts(counts: Dict[str, int]) -> str:
+    return ';'.join(f"{value}:{amount}" for value, amount in sorted(counts.items()))
+
+
+def to_report(tables: Dict, edges: Dict, files: int) -> Dict:
+    relations = []
+    for (source, target), edge in sorted(edges.items()):
+        relations.append({
+            'source': source,
+            'target': target,
+            'source_type': tables[source],
+            'target_type': tables[target],
+            'column_edges': edge['column_edges'],
+            'source_columns': sorted(edge['source_columns']),
+            'target_columns': sorted(edge['target_columns']),
+            'relation_types': dict(sorted(edge['relation_types'].items())),
+            'effect_types': dict(sorted(edge['effect_types'].items())),
+            'files': sorted(edge['files']),
+        })
+    return {
+        'summary': {
+            'files': files,
+            'tables': len(tables),
+            'table_edges': len(relations),
+            'column_edges': sum(relation['column_edges'] for relation in relations),
+        },
+        'tables': [{'name': name, 'type': table_type} for name, table_type in sorted(tables.items())],
+        'relations': relations,
+    }
+
+
+def write_csv(report: Dict, csv_file: str, delimiter: str = ','):
+    with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(CSV_FIELDS)
+        for relation in report['relations']:
+            writer.writerow([
+                relation['source'],
+                relation['target'],
+                relation['source_type'],
+                relation['target_type'],
+                relation['column_edges'],
+                len(relation['source_columns']),
+                len(relation['target_columns']),
+                _format_counts(relation['relation_types']),
+                _format_counts(relation['effect_types']),
+                ';'.join(relation['files']),
+            ])
+
+
+def print_report(report: Dict, max_show: int):
+    summary = report['summary']
+    print(f"Files: {summary['files']}, Tables: {summary['tables']}, "
+          f"Table edges: {summary['table_edges']} (from {summary['column_edges']} column edges)")
+    relations = sorted(report['relations'], key=lambda relation: -relation['column_edges'])
+    for relation in relations[:max_show]:
+        print(f"  {relation['source']} -> {relation['target']}: {relation['column_edges']} column edges, "
+              f"{len(relation['source_columns'])} -> {len(relation['target_columns'])} columns "
+              f"[{_format_counts(relation['relation_types'])}]")
+    if len(relations) > max_show:
+        print(f"  ... and {len(relations) - max_show} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Roll column-level lineage up to table-level lineage')
+    parser.add_argument('inputs', nargs='+', help='dlineage outputs (XML, /json or lineageGraph_*.json) or directories')
+    parser.add_argument('--json', dest='json_file', help='Write the table-level lineage to this JSON file')
+    parser.add_argument('--csv', dest='csv_file', help='Write the table-level lineage to this CSV file')
+    parser.add_argument('--delimiter', default=',', help='CSV delimiter (default: ,)')
+    parser.add_argument('--tables-only', action='store_true',
+                        help='Connect tables and views directly through intermediate results (RS-1, select lists, ...)')
+    parser.add_argument('--max-show', type=int, default=20, help='Table edges to print (default: 20)')
+
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print(f"Error: File '{path}' not found")
+            sys.exit(1)
+        paths.extend(lineage_io.find_lineage_files(path))
+
+    tables, edges = rollup(paths)
+    if args.tables_only:
+        tables, edges = collapse_intermediates(tables, edges)
+    report = to_report(tables, edges, len(paths))
+
+    print_report(report, args.max_show)
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Table-level lineage written to: {args.json_file}")
+    if args.csv_file:
+        write_csv(report, args.csv_file, args.delimiter)
+        print(f"Table-level lineage written to: {args.csv_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Inverted index of the table and column names in dlineage outputs.
+
+The index is a SQLite database next to the outputs (data/output/dlineage/search_index.sqlite).
+Every table and column is stored once in `entries`, and is reachable from several lower-case
+terms in `terms`: its own name and its qualified forms (table.column, schema.table.column, ...),
+so both `email` and `customer.email` find CUSTOMER.EMAIL with a prefix range scan on one index.
+Files are re-indexed only when their size or modification time changed.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import lineage_io
+
+INDEX_NAME = 'search_index.sqlite'
+INDEX_VERSION = 1
+DEFAULT_OUTPUT_DIR = os.environ.get('DLINEAGE_OUTPUT_DIR', os.path.join('data', 'output', 'dlineage'))
+DEFAULT_LIMIT = 50
+BATCH_ROWS = 10000
+
+# Upper bound for prefix range scans: sorts after every string that starts with the prefix
+_PREFIX_END = chr(0x10FFFF)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    database_name TEXT,
+    schema_name TEXT,
+    table_name TEXT,
+    column_name TEXT,
+    type TEXT,
+    coordinates TEXT
+);
+CREATE TABLE IF NOT EXISTS terms (term TEXT NOT NULL, entry_id INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS terms_term ON terms (term);
+CREATE INDEX IF NOT EXISTS terms_entry ON terms (entry_id);
+CREATE INDEX IF NOT EXISTS entries_file ON entries (file_id);
+"""
+
+
+def index_path_for(output_dir: str) -> str:
+    return os.path.join(output_dir, INDEX_NAME)
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Open (and create) the index; WAL lets the web server read while an analysis writes"""
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(_SCHEMA)
+    row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if row is None or int(row[0]) != INDEX_VERSION:
+        with connection:
+            connection.execute('DELETE FROM terms')
+            connection.execute('DELETE FROM entries')
+            connection.execute('DELETE FROM files')
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+    return connection
+
+
+def _name_parts(*names: Optional[str]) -> List[str]:
+    parts = []
+    for name in names:
+        name = lineage_io.clean_name(name)
+        if name:
+            parts.extend(part.strip('"`[]').lower() for part in name.split('.') if part)
+    return parts
+
+
+def _terms(parts: List[str]) -> List[str]:
+    """Every suffix of the qualified name: c, t.c, s.t.c, d.s.t.c"""
+    return sorted({'.'.join(parts[i:]) for i in range(len(parts))})
+
+
+def _entries(records: Iterator[Tuple[str, Dict]]) -> Iterator[Tuple[Tuple, List[str]]]:
+    tables = {}
+    for kind, record in records:
+        if kind == 'table':
+            tables[record['id']] = record
+            parts = _name_parts(record['database'], record['schema'], record['name'])
+            yield ('table', record['database'], record['schema'], record['name'], None, record['type'],
+                   record['coordinates']), _terms(parts)
+        elif kind == 'column':
+            table = tables.get(record['table_id'])
+            if table is None or not record['name']:
+                continue
+            parts = _name_parts(table['database'], table['schema'], table['name'], record['name'])
+            yield ('column', table['database'], table['schema'], table['name'], record['name'], table['type'],
+                   record['coordinates']), _terms(parts)
+
+
+def _remove_file(connection: sqlite3.Connection, file_id: int):
+    connection.execute('DELETE FROM terms WHERE entry_id IN (SELECT id FROM entries WHERE file_id = ?)', (file_id,))
+    connection.execute('DELETE FROM entries WHERE file_id = ?', (file_id,))
+    connection.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+
+def _insert(connection: sqlite3.Connection, entries: List[Tuple], terms: List[Tuple]):
+    connection.executemany('INSERT INTO entries (id, file_id, kind, database_name, schema_name, table_name, '
+                           'column_name, type, coordinates) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', entries)
+    connection.executemany('INSERT INTO terms (term, entry_id) VALUES (?, ?)', terms)
+
+
+def update_file(connection: sqlite3.Connection, path: str, records=None, force: bool = False) -> bool:
+    """
+    (Re-)index one output file unless it is unchanged since it was last indexed.
+    `records` can be given when the caller already has the document loaded.
+    Returns True when the file was indexed.
+    """
+    name = os.path.basename(path)
+    stat = os.stat(path)
+    row = connection.execute('SELECT id, size, mtime_ns FROM files WHERE name = ?', (name,)).fetchone()
+    if row is not None and not force and (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns):
+        return False
+    if records is None:
+        records = lineage_io.iter_lineage(path, relations=False)
+    with connection:
+        if row is not None:
+            _remove_file(connection, row[0])
+        file_id = connection.execute('INSERT INTO files (name, size, mtime_ns) VALUES (?, ?, ?)',
+                                     (name, stat.st_size, stat.st_mtime_ns)).lastrowid
+        # Entry ids are assigned here so rows can be inserted in batches
+        next_id = connection.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM entries').fetchone()[0]
+        entries = []
+        terms = []
+        try:
+            for entry, entry_terms in _entries(records):
+                coordinates = json.dumps(entry[-1]) if entry[-1] else None
+                entries.append((next_id, file_id) + entry[:-1] + (coordinates,))
+                terms.extend((term, next_id) for term in entry_terms)
+                next_id += 1
+                if len(entries) >= BATCH_ROWS:
+                    _insert(connection, entries, terms)
+                    entries, terms = [], []
+            _insert(connection, entries, terms)
+        except lineage_io.PARSE_ERRORS as e:
+            # Not a lineage output (or truncated): keep only the file row so it is not retried until it changes
+            connection.execute('DELETE FROM terms WHERE entry_id IN (SELECT id FROM entries WHERE file_id = ?)',
+                               (file_id,))
+            connection.execute('DELETE FROM entries WHERE file_id = ?', (file_id,))
+            print(f"Skipping {name}: {e}")
+    return True
+
+
+def remove_file(connection: sqlite3.Connection, path: str):
+    row = connection.execute('SELECT id FROM files WHERE name = ?', (os.path.basename(path),)).fetchone()
+    if row is not None:
+        with connection:
+            _remove_file(connection, row[0])
+
+
+def refresh(output_dir: str, rebuild: bool = False) -> Dict[str, int]:
+    """Bring the index of output_dir up to date: index new and changed files, drop deleted ones"""
+    connection = connect(index_path_for(output_dir))
+    try:
+        paths = lineage_io.find_lineage_files(output_dir)
+        names = {os.path.basename(path) for path in paths}
+        removed = 0
+        for file_id, name in connection.execute('SELECT id, name FROM files').fetchall():
+            if rebuild or name not in names:
+                with connection:
+                    _remove_file(connection, file_id)
+                removed += name not in names
+        updated = sum(update_file(connection, path) for path in paths)
+        return {'files': len(paths), 'updated': updated, 'removed': removed}
+    finally:
+        connection.close()
+
+
+def index_output(output_path: str, document: Optional[Dict] = None):
+    """Called by dlineage.py after it writes an output, so the index stays current without rescans"""
+    connection = connect(index_path_for(os.path.dirname(output_path) or '.'))
+    try:
+        records = lineage_io.iter_json_document(document, relations=False) if document is not None else None
+        update_file(connection, output_path, records, force=True)
+    finally:
+        connection.close()
+
+
+def _normalize_query(query: str) -> str:
+    return '.'.join(part.strip('"`[] ') for part in query.strip().lower().split('.'))
+
+
+def search(db_path: str, query: str, limit: int = DEFAULT_LIMIT, kind: Optional[str] = None) -> List[Dict]:
+    """
+    Case-insensitive prefix search over names and qualified names.
+    Exact matches come first, then the shortest matching names.
+    """
+    query = _normalize_query(query)
+    if not query or not os.path.exists(db_path):
+        return []
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, timeout=30)
+    try:
+        sql = ('SELECT e.kind, e.database_name, e.schema_name, e.table_name, e.column_name, e.type, f.name, '
+               'e.coordinates, MAX(t.term = ?) AS exact, MIN(LENGTH(t.term)) AS length '
+               'FROM terms t JOIN entries e ON e.id = t.entry_id JOIN files f ON f.id = e.file_id '
+               'WHERE t.term >= ? AND t.term < ?')
+        params = [query, query, query + _PREFIX_END]
+        if kind:
+            sql += ' AND e.kind = ?'
+            params.append(kind)
+        sql += ' GROUP BY e.id ORDER BY exact DESC, length, f.name, e.id LIMIT ?'
+        params.append(limit)
+        rows = connection.execute(sql, params).fetchall()
+    finally:
+        connection.close()
+    return [
+        {
+            'kind': row[0],
+            'database': row[1],
+            'schema': row[2],
+            'table': row[3],
+            'column': row[4],
+            'type': row[5],
+            'file': row[6],
+            'coordinates': json.loads(row[7]) if row[7] else [],
+        }
+        for row in rows
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index and search table and column names in dlineage outputs')
+    subparsers = parser.add_subparsers(dest='command')
+    for command, help_text in (('update', 'Index new and changed outputs, drop deleted ones'),
+                               ('rebuild', 'Re-index every output from scratch')):
+        subparser = subparsers.add_parser(command, help=help_text)
+        subparser.add_argument('output_dir', nargs='?', default=DEFAULT_OUTPUT_DIR,
+                               help=f'dlineage output directory (default: {DEFAULT_OUTPUT_DIR})')
+    search_parser = subparsers.add_parser('search', help='Prefix search, e.g. customer.email')
+    search_parser.add_argument('query')
+    search_parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                               help=f'dlineage output directory (default: {DEFAULT_OUTPUT_DIR})')
+    search_parser.add_argument('--kind', choices=['table', 'column'], help='Only tables or only columns')
+    search_parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help=f'Maximum results (default: {DEFAULT_LIMIT})')
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+
+    output_dir = args.output_dir
+    if not os.path.isdir(output_dir):
+        print(f"Error: Directory '{output_dir}' not found")
+        sys.exit(1)
+
+    if args.command in ('update', 'rebuild'):
+        started = time.perf_counter()
+        result = refresh(output_dir, rebuild=args.command == 'rebuild')
+        print(f"Indexed {result['updated']} of {result['files']} files, removed {result['removed']} "
+              f"({time.perf_counter() - started:.2f}s): {index_path_for(output_dir)}")
+        return
+
+    started = time.perf_counter()
+    results = search(index_path_for(output_dir), args.query, args.limit, args.kind)
+    for result in results:
+        name = '.'.join(part for part in (result['schema'], result['table'], result['column'])
+                        if lineage_io.clean_name(part))
+        coordinates = ' '.join(f"[{x},{y}]" for x, y in result['coordinates'][:1])
+        print(f"{result['kind']:<7} {name}  {result['file']} {coordinates}".rstrip())
+    print(f"{len(results)} results ({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,143 @@ import socketserver
 import subprocess
 import json
 import glob
+import threading
+import time
+import queue
+import argparse
+import contextlib
+import shutil
+import urllib.parse
+import select
+
+import metrics
+import search_index
+import watch
+
+# リクエストのメトリクス（パスごとではなく、ルート単位で集計する）
+HTTP_REQUESTS = metrics.Counter("http_requests_total", "HTTP requests by route, method and status",
+                                ["route", "method", "status"])
+HTTP_LATENCY = metrics.Histogram("http_request_duration_seconds", "HTTP request latency by route", ["route"])
+HTTP_BYTES = metrics.Counter("http_response_bytes_total", "Bytes sent to clients by route", ["route"])
+HTTP_CONNECTIONS = metrics.Gauge("http_open_connections", "Currently open client connections")
+OUTPUT_DIR_BYTES = metrics.Gauge("dlineage_output_directory_bytes", "Total size of data/output/dlineage")
+OUTPUT_DIR_BYTES.set_function(metrics.TTLCache(lambda: metrics.directory_size("data/output/dlineage"), 30))
+
+# サーバー内で実行する分析ジョブのメトリクス
+JOB_QUEUE_DEPTH = metrics.Gauge("dlineage_job_queue_depth", "Analysis jobs waiting to run")
+JOB_RUNNING = metrics.Gauge("dlineage_jobs_running", "Analysis jobs currently running")
+JOB_QUEUE_DEPTH.set(0)
+JOB_RUNNING.set(0)
+JOB_DURATION = metrics.Histogram("dlineage_job_duration_seconds", "Analysis job duration by command and status",
+                                 ["command", "status"], buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+JVM_HEAP = metrics.Gauge("dlineage_jvm_heap_bytes", "JVM heap of the analysis process", ["area"])
+
+ROUTES = ("/api/json-files", "/api/er-json-files", "/api/events", "/api/search", "/metrics")
+
+# 分析スクリプトのディレクトリ（コンテナ内では/app）
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 監視モードで変更が落ち着くまで待つ秒数
+DEBOUNCE_SECONDS = 0.5
+# 監視モードで1ファイルの分析を待つ秒数（超えた場合はworkerを強制終了して起動し直す）
+DEFAULT_ANALYSIS_TIMEOUT = 600
+SQL_SUFFIXES = (".sql",)
+
+# JVMを使う分析は同時に1つだけ実行する
+_job_slot = threading.Semaphore(1)
+
+class EventBroker:
+    """Server-Sent Eventsの購読者（接続中のブラウザ）へイベントを配信する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                # 読み出しが止まっているクライアントのイベントは捨てる
+                pass
+
+EVENTS = EventBroker()
+
+class CountingWriter:
+    """送信バイト数を数えるwfileのラッパー"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self.wfile.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.wfile, name)
+
 
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     """カスタムHTTPリクエストハンドラー"""
-    
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+        HTTP_CONNECTIONS.inc()
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            HTTP_CONNECTIONS.dec()
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
+    def handle_one_request(self):
+        # 1リクエストごとにルート・ステータス・レイテンシ・送信バイト数を記録
+        self.command = None
+        self.status_code = None
+        start = time.perf_counter()
+        bytes_before = self.wfile.bytes_written
+        super().handle_one_request()
+        if self.command is None:
+            return
+        path = self.path.split("?", 1)[0]
+        route = path if path in ROUTES else "static"
+        HTTP_REQUESTS.inc(route=route, method=self.command, status=self.status_code or 0)
+        HTTP_LATENCY.observe(time.perf_counter() - start, route=route)
+        HTTP_BYTES.inc(self.wfile.bytes_written - bytes_before, route=route)
+
+    def log_message(self, format, *args):
+        # Prometheusからの定期的なスクレイプはログに出さない
+        if getattr(self, "path", "") != "/metrics":
+            super().log_message(format, *args)
+
     def do_GET(self):
-        if self.path == "/api/json-files":
+        if self.path == "/metrics":
+            self.send_metrics()
+        elif self.path == "/api/events":
+            # 監視モードでグラフが更新されたことを通知する
+            self.send_events()
+        elif self.path.split("?", 1)[0] == "/api/search":
+            # テーブル名・カラム名の検索（グラフのファイルは開かずにインデックスだけを引く）
+            self.send_search_results()
+        elif self.path == "/api/json-files":
             # JSONファイルのリストを返す
             self.send_json_file_list()
         elif self.path == "/api/er-json-files":
@@ -40,6 +171,31 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, f"Internal Server Error: {str(e)}")
     
+    def send_search_results(self):
+        """/api/search?q=名前の前方一致（大文字小文字は区別しない）&kind=table|column&limit=件数"""
+        try:
+            params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            query = params.get("q", [""])[0]
+            kind = params.get("kind", [None])[0]
+            limit = min(int(params.get("limit", [search_index.DEFAULT_LIMIT])[0]), 1000)
+            started = time.perf_counter()
+            results = search_index.search(search_index.index_path_for("data/output/dlineage"), query, limit, kind)
+            body = json.dumps({
+                "query": query,
+                "results": results,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+            }, ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except ValueError as e:
+            self.send_error(400, f"Bad Request: {str(e)}")
+        except Exception as e:
+            self.send_error(500, f"Internal Server Error: {str(e)}")
+    
     def send_er_json_file_list(self):
         """ER図のJSONファイルリストを返す"""
         try:
@@ -60,13 +216,227 @@ class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, f"Internal Server Error: {str(e)}")
 
-def serve_http():
-    """widget配下でHTTPサーバーを起動"""
+    def send_metrics(self):
+        """Prometheusのテキスト形式でメトリクスを返す"""
+        body = metrics.REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_events(self):
+        """Server-Sent Eventsのストリームを返す（接続が切れるまで保持）"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.close_connection = True
+        subscriber = EVENTS.subscribe()
+        try:
+            self.wfile.write(b"retry: 3000\n\n")
+            self.wfile.flush()
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=15)
+                    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                except queue.Empty:
+                    message = ": keepalive\n\n"
+                self.wfile.write(message.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            EVENTS.unsubscribe(subscriber)
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """リクエストごとにスレッドで処理するHTTPサーバー（Python 3.6にはhttp.server.ThreadingHTTPServerがないため）"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+@contextlib.contextmanager
+def track_job(command):
+    """分析ジョブの待ち行列・実行時間をメトリクスに記録（結果はjob["status"]に設定する）"""
+    JOB_QUEUE_DEPTH.inc()
+    with _job_slot:
+        JOB_QUEUE_DEPTH.dec()
+        JOB_RUNNING.inc()
+        job = {"status": "failed"}
+        start = time.perf_counter()
+        try:
+            yield job
+        finally:
+            JOB_RUNNING.dec()
+            JOB_DURATION.observe(time.perf_counter() - start, command=command, status=job["status"])
+
+def record_jvm_heap(used, committed, max_heap):
+    """分析プロセスから報告されたJVMヒープ使用量を記録"""
+    JVM_HEAP.set(used, area="used")
+    JVM_HEAP.set(committed, area="committed")
+    JVM_HEAP.set(max_heap, area="max")
+
+class AnalyzerWorker:
+    """JVMを起動したままのdlineage.py /workerプロセス（終了していた場合は次の要求で起動し直す）"""
+
+    def __init__(self, jvm_args, output_dir, timeout=None):
+        self.jvm_args = jvm_args
+        self.env = dict(os.environ, DLINEAGE_OUTPUT_DIR=output_dir)
+        self.timeout = timeout
+        self.process = None
+
+    def _start(self):
+        self.process = subprocess.Popen(["python3", "dlineage.py", "/worker"] + self.jvm_args, cwd=APP_DIR,
+                                        env=self.env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        universal_newlines=True, bufsize=1)
+
+    def _read_response(self):
+        """workerの応答を1行読む（timeout秒を過ぎた場合はNone）"""
+        if self.timeout:
+            readable, _, _ = select.select([self.process.stdout], [], [], self.timeout)
+            if not readable:
+                return None
+        return self.process.stdout.readline()
+
+    def analyze(self, args):
+        """1件分析し、workerの応答（status、outputs、duration、heap）を返す"""
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+        try:
+            self.process.stdin.write(json.dumps({"args": args}) + "\n")
+            self.process.stdin.flush()
+            line = self._read_response()
+        except BrokenPipeError:
+            line = ""
+        if line is None:
+            # 応答のない分析で監視全体が止まらないよう、workerを終了して次の要求で起動し直す
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+            return {"status": "error", "error": f"analysis timed out after {self.timeout}s", "outputs": []}
+        if not line:
+            self.process = None
+            return {"status": "error", "error": "analyzer worker exited", "outputs": []}
+        return json.loads(line)
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+def graph_name_for(sql_path, input_dir):
+    """SQLファイルのグラフ名（監視ディレクトリからの相対パス。サブディレクトリの同名ファイルと衝突しないよう区切りは__）"""
+    return os.path.splitext(os.path.relpath(sql_path, input_dir))[0].replace(os.sep, "__")
+
+def graph_file_for(sql_path, input_dir):
+    """dlineage.py /f /graph /graphName が書き出すグラフのファイル名"""
+    return f"lineageGraph_{graph_name_for(sql_path, input_dir)}.json"
+
+def find_sql_files(input_dir):
+    sql_files = []
+    for root, dirs, files in os.walk(input_dir):
+        sql_files.extend(os.path.join(root, name) for name in files if name.lower().endswith(SQL_SUFFIXES))
+    return sorted(sql_files)
+
+def is_stale(sql_path, input_dir, output_dir):
+    """グラフが未作成、またはSQLファイルより古い場合にTrue"""
+    graph_path = os.path.join(output_dir, graph_file_for(sql_path, input_dir))
+    return not os.path.exists(graph_path) or os.path.getmtime(graph_path) < os.path.getmtime(sql_path)
+
+def analyze_sql_file(worker, sql_path, input_dir, output_dir, dlineage_args):
+    """変更されたSQLファイル1件を分析してグラフを書き直し、ブラウザへ通知"""
+    graph_name = graph_file_for(sql_path, input_dir)
+    event = {"file": graph_name, "source": os.path.relpath(sql_path, input_dir)}
+    if not os.path.isfile(sql_path):
+        # 削除されたSQLのグラフも削除
+        graph_path = os.path.join(output_dir, graph_name)
+        if os.path.exists(graph_path):
+            os.remove(graph_path)
+        shutil.rmtree(os.path.splitext(graph_path)[0] + ".parts", ignore_errors=True)
+        connection = search_index.connect(search_index.index_path_for(output_dir))
+        try:
+            search_index.remove_file(connection, graph_path)
+        finally:
+            connection.close()
+        event["status"] = "removed"
+        EVENTS.publish("graph", event)
+        return
+
+    args = ["/f", sql_path] + dlineage_args
+    if "/graph" not in args:
+        args.append("/graph")
+    args += ["/graphName", graph_name_for(sql_path, input_dir)]
+    if "/profile" in args and args.index("/profile") + 1 < len(args):
+        # 監視モードではSQLファイルごとのサブディレクトリにプロファイルを出力
+        index = args.index("/profile") + 1
+        args[index] = os.path.join(args[index], os.path.splitext(os.path.relpath(sql_path, input_dir))[0])
+    with track_job("watch") as job:
+        response = worker.analyze(args)
+        if response.get("status") == "ok" and response.get("outputs"):
+            job["status"] = "success"
+    heap = response.get("heap")
+    if heap:
+        record_jvm_heap(heap["used"], heap["committed"], heap["max"])
+    event["status"] = "updated" if job["status"] == "success" else "failed"
+    if job["status"] != "success":
+        event["error"] = response.get("error") or "no graph was written (see the server log)"
+    print(f"[watch] {event['source']}: {event['status']}")
+    EVENTS.publish("graph", event)
+
+def watch_input(input_dir, output_dir, dlineage_args, polling=False, timeout=DEFAULT_ANALYSIS_TIMEOUT):
+    """input_dirを監視し、変更されたSQLファイルだけを常駐workerで再分析する"""
+    os.makedirs(output_dir, exist_ok=True)
+    # JVMの起動オプションに関係する引数はworkerの起動時にも渡す
+    jvm_args = []
+    for option in ("/maxHeap", "/gcLog", "/profile"):
+        if option in dlineage_args and dlineage_args.index(option) + 1 < len(dlineage_args):
+            jvm_args += dlineage_args[dlineage_args.index(option):dlineage_args.index(option) + 2]
+    worker = AnalyzerWorker(jvm_args, output_dir, timeout)
+    watcher = watch.create_watcher(input_dir, polling)
+    print(f"Watching {input_dir} ({type(watcher).__name__})")
+
+    try:
+        # 起動時はグラフがない、または古いSQLファイルだけを分析
+        for sql_path in find_sql_files(input_dir):
+            if is_stale(sql_path, input_dir, output_dir):
+                analyze_sql_file(worker, sql_path, input_dir, output_dir, dlineage_args)
+        for changed in watch.debounced_changes(watcher, DEBOUNCE_SECONDS):
+            pending = {path for path in changed if path.lower().endswith(SQL_SUFFIXES)}
+            if any(os.path.isdir(path) for path in changed):
+                # ディレクトリの追加・イベント溢れは再走査で拾う
+                pending.update(path for path in find_sql_files(input_dir) if is_stale(path, input_dir, output_dir))
+            for sql_path in sorted(pending):
+                analyze_sql_file(worker, sql_path, input_dir, output_dir, dlineage_args)
+    finally:
+        watcher.close()
+        worker.close()
+
+def serve_http(argv=()):
+    """widget配下でHTTPサーバーを起動（--watchでdata/inputの監視と再分析も行う）"""
+    parser = argparse.ArgumentParser(prog="server.py serve",
+                                     description="Serve the viewer; with --watch, re-analyze changed SQL files")
+    parser.add_argument("--watch", action="store_true", help="Watch the input directory and re-analyze changed SQL files")
+    parser.add_argument("--watch-dir", default="data/input", help="Directory to watch, relative to widget/ (default: data/input)")
+    parser.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify (e.g. Docker Desktop mounts)")
+    parser.add_argument("--analysis-timeout", type=float, default=DEFAULT_ANALYSIS_TIMEOUT,
+                        help=f"Seconds to wait for one analysis before restarting the worker (default: {DEFAULT_ANALYSIS_TIMEOUT})")
+    options, dlineage_args = parser.parse_known_args(argv)
+
     os.chdir("widget")
     PORT = 8000
     Handler = CustomHTTPRequestHandler
-    
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+
+    # 検索インデックスに未登録・更新済みの出力を取り込む（分析時の更新より前に作られた出力のため）
+    if os.path.isdir("data/output/dlineage"):
+        threading.Thread(target=search_index.refresh, args=("data/output/dlineage",), daemon=True).start()
+
+    if options.watch:
+        watcher_thread = threading.Thread(
+            target=watch_input, daemon=True,
+            args=(os.path.abspath(options.watch_dir), os.path.abspath("data/output/dlineage"), dlineage_args, options.poll,
+                  options.analysis_timeout))
+        watcher_thread.start()
+
+    with ThreadingHTTPServer(("", PORT), Handler) as httpd:
         print(f"Server running at http://0.0.0.0:{PORT}/")
         httpd.serve_forever()
 
@@ -88,6 +458,42 @@ def run_bulk_dlineage(args):
     result = subprocess.run(cmd, cwd="/app")
     sys.exit(result.returncode)
 
+def run_lineage_export(args):
+    """lineage_export.pyコマンドを実行"""
+    cmd = ["python3", "lineage_export.py"] + args
+    result = subprocess.run(cmd, cwd="/app")
+    sys.exit(result.returncode)
+
+def run_lineage_diff(args):
+    """lineage_diff.pyコマンドを実行"""
+    cmd = ["python3", "lineage_diff.py"] + args
+    result = subprocess.run(cmd, cwd="/app")
+    sys.exit(result.returncode)
+
+def run_graph_levels(args):
+    """graph_levels.pyコマンドを実行"""
+    cmd = ["python3", "graph_levels.py"] + args
+    result = subprocess.run(cmd, cwd="/app")
+    sys.exit(result.returncode)
+
+def run_lineage_rollup(args):
+    """lineage_rollup.pyコマンドを実行"""
+    cmd = ["python3", "lineage_rollup.py"] + args
+    result = subprocess.run(cmd, cwd="/app")
+    sys.exit(result.returncode)
+
+def run_search_index(args):
+    """search_index.pyコマンドを実行"""
+    cmd = ["python3", "search_index.py"] + args
+    result = subprocess.run(cmd, cwd="/app")
+    sys.exit(result.returncode)
+
+def run_sql_dedup(args):
+    """sql_dedup.pyコマンドを実行"""
+    cmd = ["python3", "sql_dedup.py"] + args
+    result = subprocess.run(cmd, cwd="/app")
+    sys.exit(result.returncode)
+
 def run_split(args):
     """split.pyコマンドを実行"""
     cmd = ["python3", "split.py"] + args
@@ -97,7 +503,7 @@ def run_split(args):
 if __name__ == "__main__":
     # 引数がない場合、または最初の引数が"serve"の場合はHTTPサーバーを起動
     if len(sys.argv) == 1 or (len(sys.argv) > 1 and sys.argv[1] == "serve"):
-        serve_http()
+        serve_http(sys.argv[2:])
     elif len(sys.argv) > 1:
         # 第1引数によってコマンドをルーティング
         command = sys.argv[1]
@@ -107,6 +513,18 @@ if __name__ == "__main__":
             run_analyze_delete(args)
         elif command == "bulk_dlineage":
             run_bulk_dlineage(args)
+        elif command == "lineage_export":
+            run_lineage_export(args)
+        elif command == "lineage_diff":
+            run_lineage_diff(args)
+        elif command == "graph_levels":
+            run_graph_levels(args)
+        elif command == "lineage_rollup":
+            run_lineage_rollup(args)
+        elif command == "search_index":
+            run_search_index(args)
+        elif command == "sql_dedup":
+            run_sql_dedup(args)
         elif command == "split":  
             run_split(args)
         else:
@@ -13,6 +13,8 @@ except ImportError:
     print("Error: sqlparse is not installed. Please install it using: pip install sqlparse")
     sys.exit(1)
 
+import sql_index
+
 
 class SQLSplitter:
     def __init__(self):
@@ -27,29 +29,12 @@ class SQLSplitter:
         """Check if statement is DDL (CREATE TABLE/VIEW/INDEX, ALTER, DROP)"""
         # Remove comments and normalize
         cleaned = sqlparse.format(statement, strip_comments=True)
-        upper_stmt = cleaned.strip().upper()
-        
-        # Exclude temporary tables
-        if self.is_temp_table_creation(cleaned):
-            return False
-            
-        ddl_keywords = ['CREATE TABLE', 'CREATE VIEW', 'CREATE INDEX', 'CREATE UNIQUE INDEX',
-                        'ALTER TABLE', 'DROP TABLE', 'DROP VIEW', 'DROP INDEX']
-        return any(upper_stmt.startswith(keyword) for keyword in ddl_keywords)
+        # Temporary tables are classified separately from DDL
+        return sql_index.classify_statement(cleaned) == 'ddl'
     
     def is_temp_table_creation(self, statement: str) -> bool:
         """Check if statement creates a temporary table"""
-        upper_stmt = statement.strip().upper()
-        # Check for various temporary table patterns
-        temp_patterns = [
-            r'CREATE\s+(?:GLOBAL\s+|LOCAL\s+)?TEMP(?:ORARY)?\s+TABLE',
-            r'CREATE\s+TABLE\s+#',  # SQL Server temp table
-            r'CREATE\s+TABLE\s+\w+\s+AS\s+SELECT',  # CTAS that might be temporary
-        ]
-        for pattern in temp_patterns:
-            if re.search(pattern, upper_stmt):
-                return True
-        return False
+        return sql_index.is_temp_table_creation(statement)
     
     def extract_cte_from_statement(self, statement: str) -> Tuple[str, str]:
         """Extract CTE (WITH clause) from statement and return (cte, remaining_statement)"""
@@ -187,46 +172,63 @@ class SQLSplitter:
         # Parse all statements
         statements = sqlparse.split(content)
         
-        results = {
+        results = self._empty_results()
+        
+        for statement in statements:
+            if not statement.strip():
+                continue
+            
+            formatted = sqlparse.format(statement, strip_comments=False)
+            cleaned = sqlparse.format(formatted, strip_comments=True)
+            self._add_statement(results, sql_index.classify_statement(cleaned), formatted)
+        
+        return results
+    
+    def split_indexed_file(self, file_path: str) -> Dict[str, List[str]]:
+        """Split a SQL file using its persisted statement index instead of re-parsing it"""
+        results = self._empty_results()
+        
+        for entry, statement in sql_index.read_statements(file_path):
+            # Same trailing whitespace cleanup sqlparse.format applies
+            formatted = '\n'.join(line.rstrip() for line in statement.splitlines())
+            self._add_statement(results, entry['type'], formatted)
+        
+        return results
+    
+    def _empty_results(self) -> Dict[str, List[str]]:
+        return {
             'ddl': [],
             'temp_tables': [],
             'cte': [],
             'subqueries': [],
             'main': []
         }
+    
+    def _add_statement(self, results: Dict[str, List[str]], statement_type: str, formatted: str):
+        """Route one classified statement into the split results"""
+        # Temporary table creation and DDL are kept as-is
+        if statement_type == 'temp_table':
+            results['temp_tables'].append(formatted)
+            return
+        if statement_type == 'ddl':
+            results['ddl'].append(formatted)
+            return
         
-        for statement in statements:
-            if not statement.strip():
-                continue
-            
-            formatted = sqlparse.format(statement, strip_comments=False)
-            
-            # Check if it's temporary table creation first
-            if self.is_temp_table_creation(formatted):
-                results['temp_tables'].append(formatted)
-                continue
-                
-            # Then check if it's DDL
-            if self.is_ddl_statement(formatted):
-                results['ddl'].append(formatted)
-                continue
-            
-            # Check for CTE
+        # Check for CTE (only statements mentioning WITH need a full parse)
+        if re.search(r'\bWITH\b', formatted, re.IGNORECASE):
             cte_part, remaining = self.extract_cte_from_statement(formatted)
             if cte_part:
                 results['cte'].append(cte_part)
                 formatted = remaining
-            
-            # Extract outer subqueries (simplified for now)
-            subqueries, formatted = self.extract_outer_subqueries(formatted)
-            if subqueries:
-                results['subqueries'].extend(subqueries)
-            
-            # What's left goes to main
-            if formatted.strip():
-                results['main'].append(formatted)
         
-        return results
+        # Extract outer subqueries (simplified for now)
+        subqueries, formatted = self.extract_outer_subqueries(formatted)
+        if subqueries:
+            results['subqueries'].extend(subqueries)
+        
+        # What's left goes to main
+        if formatted.strip():
+            results['main'].append(formatted)
     
     def write_split_files(self, results: Dict[str, List[str]], output_dir: str, base_name: str):
         """Write split SQL to numbered files"""
@@ -327,17 +329,13 @@ def main():
         print(f"Error: File '{args.sql_file}' not found")
         sys.exit(1)
     
-    # Read SQL file
-    with open(args.sql_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
     # Get base name
     base_name = os.path.splitext(os.path.basename(args.sql_file))[0]
     output_subdir = os.path.join(args.output_dir, base_name)
     
     # Split SQL
     splitter = SQLSplitter()
-    results = splitter.split_sql_file(content)
+    results = splitter.split_indexed_file(args.sql_file)
     
     # Write split files
     written_files = splitter.write_split_files(results, output_subdir, base_name)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Deduplicate repeated SQL statements before lineage analysis.
+
+Statements are grouped by their normalized fingerprint (comments, whitespace, keyword case and, unless
+constants are shown, literals are ignored), computed here from the statement index offsets. Each distinct
+statement is written once to a temporary SQL file, which is analyzed instead of the input. Session-level
+statements (USE, SET, ...) are never merged: they form the context of the statements after them in the
+same file, are part of the grouping key and are replayed before a statement whose context differs from
+the one in effect. Lines of the temporary file map back to every copy, so relations in the output can be
+fanned out to all source locations.
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+import dir_config
+import lineage_io
+import sql_index
+
+SQL_SUFFIXES = ('.sql',)
+
+# Statements that change how the statements after them in the same file resolve names
+_SESSION_STATEMENT = re.compile(r'\s*(?:USE|SET|ALTER\s+SESSION)\b', re.IGNORECASE)
+
+
+def list_sql_files(path: str) -> List[str]:
+    """The file itself, or every .sql file under a directory in path order (as dlineage.py /d reads them)"""
+    if not os.path.isdir(path):
+        return [path]
+    paths = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files)
+                     if name.lower().endswith(SQL_SUFFIXES) and name != dir_config.CONFIG_NAME)
+    return paths
+
+
+def is_session_statement(sql_file: sql_index.MappedSQLFile, entry: Dict) -> bool:
+    """USE/SET-like statement; only statements the index classifies as 'other' are decoded"""
+    if entry['type'] != 'other':
+        return False
+    return _SESSION_STATEMENT.match(sql_index.strip_comments(sql_file.text(entry))) is not None
+
+
+class DedupPlan:
+    """Distinct statements of a set of SQL files and the locations of all their copies"""
+
+    def __init__(self, paths: List[str], mask_literals: bool = True):
+        self.mask_literals = mask_literals
+        self.files = []
+        # Distinct statements in first-seen order: {'path', 'entry', 'fingerprint', 'hash',
+        # 'context': [(path, entry) of the session statements before it], 'context_key',
+        # 'locations': [{'file', 'line'}], 'identical': [whether that copy is byte-identical to the analyzed one]}
+        self.groups = []
+        self.total_bytes = 0
+        self.total_statements = 0
+        self.session_statements = 0
+        # Start line of each written statement and its group (None for a replayed session statement)
+        self.start_lines = []
+        self.written_groups = []
+        self.written_bytes = 0
+        by_key = {}
+        for path in paths:
+            try:
+                index = sql_index.load_index(path)
+            except UnicodeDecodeError:
+                # dlineage.py skips non-text files as well
+                continue
+            self.files.append(path)
+            context = []
+            context_key = ()
+            with sql_index.MappedSQLFile(path) as sql_file:
+                for entry in index['statements']:
+                    self.total_statements += 1
+                    self.total_bytes += entry['end'] - entry['start']
+                    if is_session_statement(sql_file, entry):
+                        with sql_file.view(entry) as view:
+                            fingerprint = sql_index.statement_fingerprint(view, mask_literals=False)
+                        context = context + [(path, entry)]
+                        context_key = context_key + (fingerprint,)
+                        self.session_statements += 1
+                        continue
+                    with sql_file.view(entry) as view:
+                        fingerprint = sql_index.statement_fingerprint(view, mask_literals=mask_literals)
+                        statement_hash = sql_index.statement_hash(view)
+                    key = (context_key, fingerprint)
+                    group = by_key.get(key)
+                    if group is None:
+                        group = by_key[key] = {'path': path, 'entry': entry, 'fingerprint': fingerprint,
+                                               'hash': statement_hash, 'context': context, 'context_key': context_key,
+                                               'locations': [], 'identical': []}
+                        self.groups.append(group)
+                    group['locations'].append({'file': path, 'line': entry['line']})
+                    group['identical'].append(statement_hash == group['hash'])
+
+    @property
+    def analyzed_bytes(self) -> int:
+        """Bytes of the written file once write() has run, else of the distinct statements alone"""
+        if self.written_bytes:
+            return self.written_bytes
+        return sum(group['entry']['end'] - group['entry']['start'] for group in self.groups)
+
+    def write(self, output_path: str):
+        """Write each distinct statement once after its session context, remembering the line it starts on"""
+        self.start_lines = []
+        self.written_groups = []
+        self.written_bytes = 0
+        line = 1
+        active_context = ()
+        with open(output_path, 'w', encoding='utf-8') as out:
+            # A USE/SET cannot be undone, so statements without a context go before any context is replayed
+            for group in sorted(self.groups, key=lambda group: bool(group['context_key'])):
+                statements = [(group['path'], group['entry'], group)]
+                if group['context_key'] != active_context:
+                    # Replaying the whole context restores USE/SET state left by the previous statement's file
+                    statements = [(path, entry, None) for path, entry in group['context']] + statements
+                    active_context = group['context_key']
+                for path, entry, written_group in statements:
+                    with sql_index.MappedSQLFile(path) as sql_file:
+                        text = sql_file.text(entry)
+                    if not text.rstrip().endswith(';'):
+                        text += ';'
+                    self.start_lines.append(line)
+                    self.written_groups.append(written_group)
+                    self.written_bytes += entry['end'] - entry['start']
+                    out.write(text + '\n\n')
+                    line += text.count('\n') + 2
+
+    def write_temp(self) -> str:
+        fd, path = tempfile.mkstemp(prefix='dlineage_dedup_', suffix='.sql')
+        os.close(fd)
+        self.write(path)
+        return path
+
+    def locations_for_line(self, line: int) -> List[Dict]:
+        """
+        Every source location of the statement at a line of the written file.
+        Byte-identical copies are shifted to the same line; copies with a different layout point at their first line.
+        """
+        index = bisect.bisect_right(self.start_lines, line) - 1
+        if index < 0:
+            return []
+        group = self.written_groups[index]
+        if group is None:
+            return []
+        offset = line - self.start_lines[index]
+        return [{'file': location['file'], 'line': location['line'] + (offset if identical else 0)}
+                for location, identical in zip(group['locations'], group['identical'])]
+
+    def annotate_document(self, document: Dict) -> Dict:
+        """Add the source locations of each relation (by its target coordinate) to a JSON or graph output"""
+        model = lineage_io.find_sqlflow_model(document)
+        for relation in model.get('relationships') or []:
+            coordinates = lineage_io.json_coordinates((relation.get('target') or {}).get('coordinates'))
+            if coordinates:
+                relation['locations'] = self.locations_for_line(coordinates[0][0])
+        return document
+
+    def annotate_xml(self, xml_text: str) -> str:
+        """Add <location file="" line=""/> elements to each relationship of an XML output"""
+        root = ET.fromstring(xml_text)
+        for relationship in root.iter('relationship'):
+            target = relationship.find('target')
+            coordinates = lineage_io.xml_coordinates(target.get('coordinate') if target is not None else None)
+            if coordinates:
+                for location in self.locations_for_line(coordinates[0][0]):
+                    ET.SubElement(relationship, 'location', {'file': location['file'], 'line': str(location['line'])})
+        return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root, encoding='unicode')
+
+    def annotate(self, result: str) -> str:
+        """Annotate an XML or JSON output; other formats (CSV, text) are returned unchanged"""
+        stripped = result.lstrip()
+        try:
+            if stripped.startswith('<'):
+                return self.annotate_xml(stripped)
+            if stripped.startswith('{'):
+                return json.dumps(self.annotate_document(json.loads(stripped)), ensure_ascii=False)
+        except lineage_io.PARSE_ERRORS:
+            pass
+        return result
+
+    def summary(self) -> Dict:
+        total_bytes = self.total_bytes
+        analyzed_bytes = self.analyzed_bytes
+        return {
+            'files': len(self.files),
+            'statements': self.total_statements,
+            'distinct_statements': len(self.groups),
+            'session_statements': self.session_statements,
+            'duplicate_statements': self.total_statements - self.session_statements - len(self.groups),
+            'bytes': total_bytes,
+            'analyzed_bytes': analyzed_bytes,
+            'saved_ratio': round(1 - analyzed_bytes / total_bytes, 4) if total_bytes else 0.0,
+        }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        return (f"Dedup: {summary['statements']} statements in {summary['files']} files, "
+                f"{summary['distinct_statements']} distinct; analyzing {summary['analyzed_bytes']} of "
+                f"{summary['bytes']} bytes ({summary['saved_ratio'] * 100:.1f}% saved)")
+
+    def report(self) -> Dict:
+        return {
+            'summary': self.summary(),
+            'statements': [
+                {
+                    'fingerprint': group['fingerprint'],
+                    'type': group['entry']['type'],
+                    'bytes': group['entry']['end'] - group['entry']['start'],
+                    'locations': group['locations'],
+                }
+                for group in sorted(self.groups, key=lambda group: -len(group['locations']))
+            ],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show how many SQL statements are duplicates of each other')
+    parser.add_argument('path', help='SQL file or directory')
+    parser.add_argument('--keep-literals', action='store_true',
+                        help='Treat statements that differ only in constants as different')
+    parser.add_argument('--json', dest='json_file', help='Write the groups and their locations to this JSON file')
+    parser.add_argument('--max-show', type=int, default=10, help='Most repeated statements to print (default: 10)')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"Error: File '{args.path}' not found")
+        sys.exit(1)
+
+    plan = DedupPlan(list_sql_files(args.path), mask_literals=not args.keep_literals)
+    print(plan.format_summary())
+    report = plan.report()
+    for statement in report['statements'][:args.max_show]:
+        if len(statement['locations']) < 2:
+            break
+        first = statement['locations'][0]
+        print(f"  {len(statement['locations']):>5} copies  {statement['type']:<10}  {first['file']}:{first['line']}")
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to: {args.json_file}")
+
+
+if __name__ == '__main__':
+    main()
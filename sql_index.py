@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+import argparse
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+from typing import List, Dict, Optional
+
+
+# Bump when the layout of a persisted index entry changes
+INDEX_VERSION = 6
+
+# Classification only needs the beginning of a statement
+HEAD_BYTES = 4096
+CHUNK_BYTES = 1024 * 1024
+
+DEFAULT_INDEX_DIR = os.path.join("data", "cache", "sql_index")
+
+DDL_KEYWORDS = ['CREATE TABLE', 'CREATE VIEW', 'CREATE INDEX', 'CREATE UNIQUE INDEX',
+                'ALTER TABLE', 'DROP TABLE', 'DROP VIEW', 'DROP INDEX']
+
+TEMP_TABLE_PATTERNS = [
+    r'CREATE\s+(?:GLOBAL\s+|LOCAL\s+)?TEMP(?:ORARY)?\s+TABLE',
+    r'CREATE\s+TABLE\s+#',  # SQL Server temp table
+    r'CREATE\s+TABLE\s+\w+\s+AS\s+SELECT',  # CTAS that might be temporary
+]
+
+DML_KEYWORDS = ['SELECT', 'INSERT', 'UPDATE', 'MERGE', 'REPLACE', 'UPSERT']
+
+_NAME = r'([\w.#$@\[\]"`]+)'
+
+TARGET_TABLE_PATTERNS = {
+    'ddl': [
+        r'(?:CREATE(?:\s+OR\s+REPLACE)?|ALTER|DROP)\s+(?:TABLE|VIEW)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?' + _NAME,
+        r'(?:CREATE|DROP)\s+(?:UNIQUE\s+)?INDEX\s+.*?\bON\s+' + _NAME,
+    ],
+    'temp_table': [
+        r'CREATE\s+(?:GLOBAL\s+|LOCAL\s+)?(?:TEMP(?:ORARY)?\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?' + _NAME,
+    ],
+    'truncate': [
+        r'TRUNCATE\s+TABLE\s+(?:(\w+)\.)?(\w+)',
+    ],
+    'delete': [
+        r'DELETE\s+FROM\s+(?:(\w+)\.)?(\w+)',
+        r'DELETE\s+\w+\s+FROM\s+(?:(\w+)\.)?(\w+)\s+\w+',  # SQL Server style
+    ],
+    'dml': [
+        r'INSERT\s+(?:INTO|OVERWRITE\s+TABLE)\s+' + _NAME,
+        r'UPDATE\s+' + _NAME,
+        r'MERGE\s+INTO\s+' + _NAME,
+    ],
+}
+TARGET_TABLE_PATTERNS['cte'] = TARGET_TABLE_PATTERNS['dml']
+
+_COMMENT_OR_STRING = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|--[^\n]*|/\*.*?(?:\*/|\Z)""", re.DOTALL)
+
+# Tokens that matter for statement boundaries, mirroring sqlparse's StatementSplitter.
+# Everything else is skipped by the regex engine without creating Python objects; the leading lookahead
+# lists the first bytes of all alternatives so the other positions are rejected with a single set test.
+# Keywords are searched separately (_SPLIT_KEYWORD): letters are most of the input, and testing them
+# against every alternative doubled the cost of the scan.
+_BOUNDARY_TOKEN = re.compile(rb"""
+    (?=[-\#/'"`\[$;()])
+    (?:(?P<comment>(?:--|\#\ )[^\r\n]*(?:\r\n|\r|\n)?|/\*.*?\*/)
+  | (?P<literal>'(?:''|\\'|[^'])*'|"(?:""|\\"|[^"])*"|`(?:``|[^`])*`
+        |(?<![\w\])])\[[^\]\[]+\]|(?<!\S)(?P<tag>\$(?:[A-Za-z_]\w*)?\$).*?(?P=tag))
+  | (?P<punct>[;()]))
+""", re.DOTALL | re.VERBOSE)
+
+# Keywords that change the split level; matches inside comments and literals are discarded by the scan
+_SPLIT_KEYWORD = re.compile(rb"""
+    (?=[CDBEIFW])(?<![\w$\#@.])
+    (?:CREATE(?:\s+OR\s+REPLACE)?|DECLARE|BEGIN|END(?:\s+IF|\s+LOOP|\s+WHILE)?|IF|FOR|WHILE|CASE)
+    (?![\w$\#])(?!\s*\.)(?!\()
+""", re.IGNORECASE | re.VERBOSE)
+
+# Whitespace and single-line comments after ';' still belong to the finished statement
+_STATEMENT_TAIL = re.compile(rb"(?:[^\S\r\n]+|(?:--|\#\ )(?!\+)[^\r\n]*(?:\r\n|\r|\n)?)*")
+
+_WHITESPACE_BYTES = b' \t\r\n\f\v'
+
+# Whitespace and comments before the first keyword of a statement
+_LEADING_TRIVIA = re.compile(rb"(?:\s+|(?:--|\#\ )[^\r\n]*|/\*.*?\*/)*", re.DOTALL)
+
+# Tokens the fingerprint normalizes; unquoted text between them is upper-cased
+_FINGERPRINT_TOKEN = re.compile(rb"""
+    (?=[-\#/'"`0-9])
+    (?:(?P<comment>(?:--|\#\ )[^\r\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>'(?:''|\\'|[^'])*'?)
+  | (?P<quoted>"(?:""|[^"])*"?|`(?:``|[^`])*`?)
+  | (?P<number>(?<![\w$\#@.])\d+(?:\.\d*)?(?:[eE][+-]?\d+)?(?![\w$\#])))
+""", re.DOTALL | re.VERBOSE)
+
+# Collapsed whitespace (\0) is only kept between two word-like tokens; matching the \0 first lets the
+# regex engine skip to it with a byte search
+_SIGNIFICANT_SPACE = re.compile(rb"""\0(?<=[\w$#@?'"`\x80-\xff]\0)(?=[\w$#@?'"`\x80-\xff])""")
+
+_TEMP_TABLE = re.compile('|'.join(TEMP_TABLE_PATTERNS))
+_DDL_PREFIX = re.compile('|'.join(re.escape(keyword) for keyword in DDL_KEYWORDS))
+_DML_PREFIX = re.compile(r'(?:%s)\b' % '|'.join(DML_KEYWORDS))
+_TARGET_TABLE = {statement_type: [re.compile(pattern, re.IGNORECASE | re.DOTALL) for pattern in patterns]
+                 for statement_type, patterns in TARGET_TABLE_PATTERNS.items()}
+
+
+class MappedSQLFile:
+    """Read-only memory map of a SQL file that hands out statement slices without copying"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.buffer = self._map if self._map is not None else b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def view(self, entry: Dict) -> memoryview:
+        """Zero-copy slice of one indexed statement (release it before closing the file)"""
+        return memoryview(self.buffer)[entry['start']:entry['end']]
+
+    def text(self, entry: Dict) -> str:
+        """Decode one indexed statement"""
+        with self.view(entry) as view:
+            return str(view, 'utf-8')
+
+
+def index_dir() -> str:
+    """Directory that holds persisted statement indexes"""
+    return os.environ.get("SQL_INDEX_DIR", DEFAULT_INDEX_DIR)
+
+
+def file_sha256(file_path: str) -> str:
+    """Hash file contents in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def statement_hash(statement) -> str:
+    """Hash of the exact bytes of a statement (bytes-like, e.g. MappedSQLFile.view)"""
+    return hashlib.sha1(statement).hexdigest()
+
+
+def strip_comments(statement: str) -> str:
+    """Remove -- and /* */ comments while keeping quoted literals intact"""
+    return _COMMENT_OR_STRING.sub(lambda m: m.group(1) or ' ', statement)
+
+
+def statement_fingerprint(statement, mask_literals: bool = True) -> str:
+    """
+    Hash of a statement (bytes-like) that ignores comments, whitespace and the case of unquoted text.
+    With mask_literals, string and number literals are replaced by ? so copies that only differ
+    in constants share a fingerprint.
+    """
+    original = bytes(statement)
+
+    def normalize(match):
+        kind = match.lastgroup
+        if kind == 'comment':
+            return b' '
+        if kind in ('string', 'number') and mask_literals:
+            return b'?'
+        # Quoted identifiers and kept literals are case-sensitive
+        return original[match.start():match.end()]
+
+    # ASCII upper-casing keeps offsets, so matches on the upper-cased copy index the original
+    normalized = b'\0'.join(_FINGERPRINT_TOKEN.sub(normalize, original.upper()).split())
+    normalized = _SIGNIFICANT_SPACE.sub(b' ', normalized).replace(b'\0', b'')
+    return hashlib.sha1(normalized.strip().rstrip(b';')).hexdigest()
+
+
+def is_temp_table_creation(statement: str) -> bool:
+    """Check if statement creates a temporary table"""
+    upper_stmt = statement.strip().upper()
+    return _TEMP_TABLE.search(upper_stmt) is not None
+
+
+def classify_statement(statement: str) -> str:
+    """Classify a comment-free statement as ddl/temp_table/cte/delete/truncate/dml/other"""
+    upper_stmt = statement.strip().upper()
+    if is_temp_table_creation(upper_stmt):
+        return 'temp_table'
+    if _DDL_PREFIX.match(upper_stmt):
+        return 'ddl'
+    if upper_stmt.startswith('DELETE'):
+        return 'delete'
+    if upper_stmt.startswith('TRUNCATE'):
+        return 'truncate'
+    if re.match(r'WITH\b', upper_stmt):
+        return 'cte'
+    if _DML_PREFIX.match(upper_stmt):
+        return 'dml'
+    return 'other'
+
+
+def extract_target_tables(statement: str, statement_type: str) -> List[str]:
+    """Extract the tables a statement writes to (first matching pattern wins)"""
+    for pattern in _TARGET_TABLE.get(statement_type, []):
+        match = pattern.search(statement)
+        if match:
+            parts = [group for group in match.groups() if group]
+            return ['.'.join(parts)]
+    return []
+
+
+def _split_level(keyword: bytes, state: Dict) -> int:
+    """Split level change for a keyword, as sqlparse's StatementSplitter computes it"""
+    unified = b' '.join(keyword.upper().split())
+    if unified.startswith(b'CREATE'):
+        state['is_create'] = True
+        return 0
+    if unified == b'DECLARE' and state['is_create'] and state['begin_depth'] == 0:
+        return 1
+    if unified == b'BEGIN':
+        state['begin_depth'] += 1
+        return 1 if state['is_create'] else 0
+    if unified == b'END':
+        state['begin_depth'] = max(0, state['begin_depth'] - 1)
+        return -1
+    if unified in (b'IF', b'FOR', b'WHILE', b'CASE') and state['is_create'] and state['begin_depth'] > 0:
+        return 1
+    if unified in (b'END IF', b'END WHILE'):
+        return -1
+    return 0
+
+
+def _trim(buffer, start: int, end: int):
+    while start < end and buffer[start:start + 1] in _WHITESPACE_BYTES:
+        start += 1
+    while end > start and buffer[end - 1:end] in _WHITESPACE_BYTES:
+        end -= 1
+    return start, end
+
+
+def scan_statement_boundaries(buffer):
+    """Yield trimmed (start, end) byte offsets of each statement in a bytes-like buffer"""
+    state = {'is_create': False, 'begin_depth': 0}
+    level = 0
+    statement_start = 0
+    position = 0
+    size = len(buffer)
+    keyword = _SPLIT_KEYWORD.search(buffer)
+    for match in _BOUNDARY_TOKEN.finditer(buffer):
+        token_start = match.start()
+        if token_start < position:
+            # A comment already consumed as the tail of the previous statement
+            continue
+        # Keywords between the previous token and this one, in order
+        while keyword is not None and keyword.start() < token_start:
+            if keyword.start() < position:
+                # Found inside a comment or literal: look again after it
+                keyword = _SPLIT_KEYWORD.search(buffer, position)
+                continue
+            level += _split_level(keyword.group(), state)
+            keyword = _SPLIT_KEYWORD.search(buffer, keyword.end())
+        position = match.end()
+        kind = match.lastgroup
+        if kind == 'punct':
+            punct = match.group('punct')
+            if punct == b'(':
+                level += 1
+            elif punct == b')':
+                level -= 1
+            elif level <= 0:
+                position = _STATEMENT_TAIL.match(buffer, position).end()
+                start, end = _trim(buffer, statement_start, position)
+                if start < end:
+                    yield start, end
+                statement_start = position
+                state = {'is_create': False, 'begin_depth': 0}
+                level = 0
+    start, end = _trim(buffer, statement_start, size)
+    if start < end:
+        yield start, end
+
+
+def build_index(file_path: str) -> Dict:
+    """Scan a SQL file through a memory map and build its statement index"""
+    with MappedSQLFile(file_path) as sql_file:
+        buffer = sql_file.buffer
+        spans = list(scan_statement_boundaries(buffer))
+
+        # One chunked pass for the file hash, UTF-8 validation, character count and line numbers
+        digest = hashlib.sha256()
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        chars = 0
+        lines_before = 0
+        lines = []
+        span_iter = iter(spans)
+        next_span = next(span_iter, None)
+        for offset in range(0, sql_file.size, CHUNK_BYTES):
+            chunk = buffer[offset:offset + CHUNK_BYTES]
+            digest.update(chunk)
+            chars += len(decoder.decode(chunk))
+            counted = 0
+            while next_span is not None and next_span[0] < offset + len(chunk):
+                lines_before += chunk.count(b'\n', counted, next_span[0] - offset)
+                counted = next_span[0] - offset
+                lines.append(lines_before + 1)
+                next_span = next(span_iter, None)
+            lines_before += chunk.count(b'\n', counted)
+        chars += len(decoder.decode(b'', final=True))
+
+        statements = []
+        for (start, end), line in zip(spans, lines):
+            entry = {'start': start, 'end': end}
+            with sql_file.view(entry) as view:
+                # A long header comment must not push the first keyword out of the head
+                head_start = _LEADING_TRIVIA.match(view).end()
+                head = strip_comments(str(view[head_start:head_start + HEAD_BYTES], 'utf-8', 'ignore'))
+            statement_type = classify_statement(head)
+            if statement_type == 'cte':
+                # The written table follows the WITH clause, which may be long
+                head = strip_comments(sql_file.text(entry))
+            entry.update({
+                'line': line,
+                'type': statement_type,
+                'tables': extract_target_tables(head, statement_type),
+            })
+            statements.append(entry)
+
+    stat = os.stat(file_path)
+    return {
+        'version': INDEX_VERSION,
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': digest.hexdigest(),
+        'chars': chars,
+        'statements': statements,
+    }
+
+
+def _index_file_for(file_path: str) -> str:
+    key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+    return os.path.join(index_dir(), f"{key}.json")
+
+
+def _save_index(index: Dict, index_file: str):
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    tmp_file = f"{index_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(tmp_file, index_file)
+
+
+def load_index(file_path: str, use_cache: bool = True) -> Dict:
+    """Return the statement index of a file, rebuilding it only when the file hash changed"""
+    index_file = _index_file_for(file_path)
+    cached = None
+    if use_cache and os.path.exists(index_file):
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+
+    if cached and cached.get('version') == INDEX_VERSION:
+        stat = os.stat(file_path)
+        # Unchanged size and mtime: trust the index without re-hashing
+        if cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+            return cached
+        if cached['sha256'] == file_sha256(file_path):
+            cached['size'] = stat.st_size
+            cached['mtime'] = stat.st_mtime
+            _save_index(cached, index_file)
+            return cached
+
+    index = build_index(file_path)
+    if use_cache:
+        try:
+            _save_index(index, index_file)
+        except OSError as e:
+            print(f"Warning: could not persist statement index for {file_path}: {e}", file=sys.stderr)
+    return index
+
+
+def read_statements(file_path: str, index: Optional[Dict] = None, types: Optional[List[str]] = None):
+    """Yield (entry, statement_text) pairs, decoding only statements of the requested types"""
+    if index is None:
+        index = load_index(file_path)
+    with MappedSQLFile(file_path) as sql_file:
+        for entry in index['statements']:
+            if types is not None and entry['type'] not in types:
+                continue
+            yield entry, sql_file.text(entry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or show the persisted statement index of SQL files')
+    parser.add_argument('sql_files', nargs='+', help='Path to SQL files')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore cached indexes and rescan')
+
+    args = parser.parse_args()
+
+    for sql_file in args.sql_files:
+        if not os.path.exists(sql_file):
+            print(f"Error: File '{sql_file}' not found")
+            sys.exit(1)
+        if args.rebuild:
+            index = build_index(sql_file)
+            _save_index(index, _index_file_for(sql_file))
+        else:
+            index = load_index(sql_file)
+        print(f"{sql_file}: {len(index['statements'])} statements, {index['chars']} characters")
+        for entry in index['statements']:
+            tables = ', '.join(entry['tables']) or '-'
+            print(f"  line {entry['line']:>5}  bytes {entry['start']}-{entry['end']}  {entry['type']:<10}  {tables}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""ディレクトリ配下のファイル変更の監視（inotify、使えない環境ではポーリング）"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# inotifyのイベントマスク（<sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """inotifyでディレクトリツリーを監視する（新しく作られたサブディレクトリも追加で監視）"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self._watch_tree(self.root)
+
+    def _watch_tree(self, path):
+        for dir_path, dirs, files in os.walk(path):
+            wd = self._add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {dir_path}")
+            self.watches[wd] = dir_path
+
+    def wait(self, timeout):
+        """timeout秒まで待ち、変更されたパスの集合を返す（イベント溢れの場合はルートを返す）"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                changed.add(self.root)
+                continue
+            dir_path = self.watches.get(wd)
+            if dir_path is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            path = os.path.join(dir_path, os.fsdecode(name)) if name else dir_path
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # 新しいディレクトリ配下も監視し、中身は全体の再走査で拾う
+                self._watch_tree(path)
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """一定間隔でファイルの更新時刻とサイズを比較して変更を検出する"""
+
+    def __init__(self, root, interval=1.0):
+        self.root = os.path.abspath(root)
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dir_path, dirs, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(dir_path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {path for path, state in snapshot.items() if self.snapshot.get(path) != state}
+        changed.update(path for path in self.snapshot if path not in snapshot)
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def create_watcher(root, polling=False, interval=1.0):
+    """inotifyが使えればInotifyWatcher、使えない場合（Linux以外、上限超過など）はPollingWatcherを返す"""
+    if not polling:
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"inotify is not available ({e}), falling back to polling every {interval}s")
+    return PollingWatcher(root, interval)
+
+
+def debounced_changes(watcher, delay=0.5):
+    """変更が落ち着いてから（最後の変更からdelay秒後）、変更されたパスをまとめて返すジェネレーター"""
+    pending = {}
+    while True:
+        now = time.monotonic()
+        timeout = min((changed_at + delay - now for changed_at in pending.values()), default=delay)
+        for path in watcher.wait(max(timeout, 0.05)):
+            pending[path] = time.monotonic()
+        now = time.monotonic()
+        ready = {path for path, changed_at in pending.items() if now - changed_at >= delay}
+        if ready and len(ready) == len(pending):
+            pending.clear()
+            yield ready